@@ -0,0 +1,414 @@
+"""Offline benchmark suite for loading sources, matching dependencies and rendering reports.
+
+Synthetic gemnasium and PyPA tarballs, PyUp and GitHub caches and lockfiles are generated into a
+temporary directory. Every benchmark reports the best of a few rounds and is compared against
+`baselines.json`; anything slower than its baseline by more than `--threshold` or exceeding its
+budget in `BUDGETS` is flagged and makes the suite exit non-zero. Baselines are machine specific, record your own using `--save`.
+
+Usage: PYTHONPATH=src python benchmarks/bench_suite.py [--quick] [--save] [-k SUBSTRING]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from skjold.core import Dependency, SecurityAdvisorySource
+from skjold.formats import read_poetry_lock_from, read_requirements_txt_from
+from skjold.ignore import SkjoldIgnore
+from skjold.tasks import (
+    REPORT_FORMATS,
+    Configuration,
+    SourceRegistry,
+    audit,
+    get_source,
+    load_sources,
+    report,
+)
+
+BASELINES = os.path.join(os.path.dirname(__file__), "baselines.json")
+SOURCES = ("gemnasium", "pypa", "pyup", "github")
+ADVISORIES = (1_000, 10_000, 50_000)
+DEPENDENCIES = (100, 1_000, 10_000)
+# Matching and reporting run against databases of this size.
+AUDIT_ADVISORIES = 10_000
+ADVISORIES_PER_PACKAGE = 5
+ROUNDS = 3
+THRESHOLD = 0.25
+# Differences below this many seconds are noise for the quickest benchmarks.
+MIN_REGRESSION = 0.005
+# Absolute limits in seconds, flagged regardless of baselines. Pre-commit hooks pay for the import
+# of the cli on every run.
+BUDGETS = {"import/skjold.cli": 0.3}
+
+Timings = Dict[str, float]
+
+
+def _package(n: int) -> str:
+    return f"package-{n}"
+
+
+def _advisories(count: int) -> List[Tuple[str, int, str]]:
+    """Return (package, number, affected range) for 'count' synthetic advisories."""
+    return [
+        (_package(n // ADVISORIES_PER_PACKAGE), n, f"<1.{n % 20}.0")
+        for n in range(count)
+    ]
+
+
+def _write_tarball(path: str, members: Dict[str, str]) -> None:
+    with tarfile.open(path, "w:gz", compresslevel=1) as archive:
+        for name, content in members.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def write_gemnasium(path: str, count: int) -> None:
+    _write_tarball(
+        path,
+        {
+            f"gemnasium-db/pypi/{package}/CVE-2000-{n}.yml": (
+                f"identifier: CVE-2000-{n}\n"
+                f"package_slug: pypi/{package}\n"
+                f"title: Advisory {n}\n"
+                f"description: Synthetic advisory {n} affecting {package}.\n"
+                f'affected_range: "{spec}"\n'
+                f"urls:\n- https://example.com/CVE-2000-{n}\n"
+                f"cvss_v3: CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H\n"
+            )
+            for package, n, spec in _advisories(count)
+        },
+    )
+
+
+def write_pypa(path: str, count: int) -> None:
+    _write_tarball(
+        path,
+        {
+            f"advisory-db/vulns/{package}/PYSEC-2000-{n}.yaml": (
+                f"id: PYSEC-2000-{n}\n"
+                f"details: Synthetic advisory {n} affecting {package}.\n"
+                f"aliases:\n- CVE-2000-{n}\n"
+                f"references:\n- type: WEB\n  url: https://example.com/PYSEC-2000-{n}\n"
+                f"affected:\n- package:\n    name: {package}\n    ecosystem: PyPI\n"
+                f"  versions: [{', '.join(f'1.{minor}.0' for minor in range(n % 20))}]\n"
+            )
+            for package, n, _ in _advisories(count)
+        },
+    )
+
+
+def write_pyup(path: str, count: int) -> None:
+    doc: Dict[str, Any] = {"$meta": {"timestamp": 1601532001}}
+    for package, n, spec in _advisories(count):
+        doc.setdefault(package, []).append(
+            {
+                "advisory": f"Synthetic advisory {n} affecting {package}.",
+                "cve": f"CVE-2000-{n}",
+                "id": f"pyup.io-{n}",
+                "more_info_path": f"/vulnerabilities/CVE-2000-{n}/{n}/",
+                "specs": [spec],
+                "v": spec,
+            }
+        )
+    with open(path, "w") as fh:
+        json.dump(doc, fh)
+
+
+def write_github(path: str, count: int) -> None:
+    with open(path, "w") as fh:
+        json.dump(
+            [
+                {
+                    "node": {
+                        "advisory": {
+                            "ghsaId": f"GHSA-{n:04x}-0000-0000",
+                            "publishedAt": "2020-01-01T00:00:00Z",
+                            "references": [{"url": f"https://example.com/{n}"}],
+                            "summary": f"Synthetic advisory {n} affecting {package}.",
+                        },
+                        "firstPatchedVersion": {"identifier": spec[1:]},
+                        "package": {"ecosystem": "PIP", "name": package},
+                        "severity": "HIGH",
+                        "updatedAt": "2020-01-01T00:00:00Z",
+                        "vulnerableVersionRange": spec,
+                    }
+                }
+                for package, n, spec in _advisories(count)
+            ],
+            fh,
+        )
+
+
+WRITERS: Dict[str, Callable[[str, int], None]] = {
+    "gemnasium": write_gemnasium,
+    "pypa": write_pypa,
+    "pyup": write_pyup,
+    "github": write_github,
+}
+
+
+def dependencies(count: int) -> List[Tuple[str, str]]:
+    """Return (name, version) pairs; a fifth of them have advisories with 10k advisories."""
+    return [(_package(n), f"1.{n % 20}.0") for n in range(count)]
+
+
+def write_requirements_txt(path: str, count: int) -> None:
+    with open(path, "w") as fh:
+        for name, version in dependencies(count):
+            fh.write(f"{name}=={version}\n")
+
+
+def write_poetry_lock(path: str, count: int) -> None:
+    with open(path, "w") as fh:
+        for name, version in dependencies(count):
+            fh.write(f'[[package]]\nname = "{name}"\nversion = "{version}"\n\n')
+
+
+def best_of(
+    func: Callable[[], Any],
+    setup: Optional[Callable[[], Any]] = None,
+    rounds: int = ROUNDS,
+) -> float:
+    timings = []
+    for _ in range(rounds):
+        if setup is not None:
+            setup()
+        started_at = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def make_source(name: str, cache_dir: str) -> SecurityAdvisorySource:
+    return get_source(name)(cache_dir, cache_expires=10**9)
+
+
+def bench_loads(
+    root: str, sizes: Sequence[int], selected: Callable[[str], bool]
+) -> Timings:
+    timings: Timings = {}
+    for count in sizes:
+        cache_dir = os.path.join(root, f"advisories-{count}")
+        os.makedirs(cache_dir, exist_ok=True)
+        for name in SOURCES:
+            source = make_source(name, cache_dir)
+            if not any(
+                selected(f"load/{name}/{count}/{kind}") for kind in ["cold", "snapshot"]
+            ):
+                continue
+            if not os.path.exists(source.path or ""):
+                WRITERS[name](source.path or "", count)
+
+            def _drop_snapshot() -> None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(source.snapshot_path or "")
+
+            def _load() -> None:
+                make_source(name, cache_dir).prepare()
+
+            key = f"load/{name}/{count}/cold"
+            if selected(key):
+                timings[key] = best_of(_load, setup=_drop_snapshot)
+            key = f"load/{name}/{count}/snapshot"
+            if selected(key):
+                _load()
+                timings[key] = best_of(_load)
+    return timings
+
+
+def bench_import(selected: Callable[[str], bool]) -> Timings:
+    """Measure the cumulative time of 'import skjold.cli' in a fresh interpreter."""
+    key = "import/skjold.cli"
+    if not selected(key):
+        return {}
+
+    timings = []
+    for _ in range(ROUNDS):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import skjold.cli"],
+            capture_output=True,
+            check=True,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+            universal_newlines=True,
+        )
+        # import time: self [us] | cumulative | imported package
+        timings.extend(
+            int(line.split("|")[1]) / 1e6
+            for line in result.stderr.splitlines()
+            if line.split("|")[-1].strip() == "skjold.cli"
+        )
+    return {key: min(timings)}
+
+
+def bench_parse(
+    root: str, sizes: Sequence[int], selected: Callable[[str], bool]
+) -> Timings:
+    timings: Timings = {}
+    for count in sizes:
+        for filename, write, read in [
+            ("requirements.txt", write_requirements_txt, read_requirements_txt_from),
+            ("poetry.lock", write_poetry_lock, read_poetry_lock_from),
+        ]:
+            key = f"parse/{filename}/{count}"
+            if not selected(key):
+                continue
+
+            path = os.path.join(root, f"{count}-{filename}")
+            write(path, count)
+
+            def _parse() -> None:
+                with open(path) as fh:
+                    list(read(fh))
+
+            timings[key] = best_of(_parse)
+    return timings
+
+
+def bench_audit_and_report(
+    root: str, advisories: int, sizes: Sequence[int], selected: Callable[[str], bool]
+) -> Timings:
+    timings: Timings = {}
+    if not any(selected(prefix) for prefix in ["audit/", "report/"]):
+        return timings
+
+    cache_dir = os.path.join(root, f"advisories-{advisories}")
+    os.makedirs(cache_dir, exist_ok=True)
+    configuration = Configuration()
+    configuration.sources = list(SOURCES)
+    configuration.cache_dir = cache_dir
+    configuration.cache_expires = 10**9
+    for name in SOURCES:
+        path = make_source(name, cache_dir).path or ""
+        if not os.path.exists(path):
+            WRITERS[name](path, advisories)
+
+    # Sources are loaded once up front so only matching is measured.
+    registry = SourceRegistry()
+    load_sources(configuration, None, registry)
+    ignore = SkjoldIgnore("<none>")
+
+    for count in sizes:
+        packages = [
+            Dependency(name, version, ("requirements.txt", lineno))
+            for lineno, (name, version) in enumerate(dependencies(count), start=1)
+        ]
+        findings: List[Dict[str, Any]] = []
+
+        def _audit() -> None:
+            findings[:] = audit(configuration, packages, ignore, registry)
+
+        key = f"audit/{advisories}/{count}"
+        timings[key] = best_of(_audit) if selected(key) else 0.0
+        if not findings:
+            _audit()
+
+        for format_ in REPORT_FORMATS:
+            key = f"report/{format_}/{advisories}/{count}"
+            if not selected(key):
+                continue
+
+            def _report() -> None:
+                configuration.report_format = format_
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(
+                    devnull
+                ), contextlib.redirect_stderr(devnull):
+                    report(configuration, findings)
+
+            timings[key] = best_of(_report)
+
+    return {key: value for key, value in timings.items() if selected(key)}
+
+
+def compare(timings: Timings, baselines: Timings, threshold: float) -> List[str]:
+    """Print timings next to their baselines and return names of regressed benchmarks."""
+    regressions = []
+    print(f"{'benchmark':<36} {'time':>10} {'baseline':>10} {'change':>8}")
+    for key, seconds in timings.items():
+        flag = ""
+        if seconds > BUDGETS.get(key, float("inf")):
+            regressions.append(key)
+            flag = "  OVER BUDGET"
+
+        baseline = baselines.get(key)
+        if baseline is None:
+            print(f"{key:<36} {seconds * 1000:8.1f}ms {'-':>10} {'-':>8}{flag}")
+            continue
+
+        change = seconds / baseline - 1 if baseline else 0.0
+        if not flag and change > threshold and seconds - baseline > MIN_REGRESSION:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(
+            f"{key:<36} {seconds * 1000:8.1f}ms {baseline * 1000:8.1f}ms "
+            f"{change:+8.1%}{flag}"
+        )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--quick",
+        action="store_true",
+        help="Only run the smallest databases and lockfiles.",
+    )
+    parser.add_argument(
+        "--save", action="store_true", help=f"Store timings in {BASELINES}."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="Flag benchmarks slower than their baseline by more than this fraction.",
+    )
+    parser.add_argument(
+        "-k", dest="filter", default="", help="Only run benchmarks containing this."
+    )
+    args = parser.parse_args(argv)
+
+    advisories = ADVISORIES[:1] if args.quick else ADVISORIES
+    sizes = DEPENDENCIES[:2] if args.quick else DEPENDENCIES
+    audit_advisories = ADVISORIES[0] if args.quick else AUDIT_ADVISORIES
+
+    def selected(key: str) -> bool:
+        return args.filter in key
+
+    timings: Timings = {}
+    timings.update(bench_import(selected))
+    with tempfile.TemporaryDirectory(prefix="skjold-bench-") as root:
+        timings.update(bench_loads(root, advisories, selected))
+        timings.update(bench_parse(root, sizes, selected))
+        timings.update(bench_audit_and_report(root, audit_advisories, sizes, selected))
+
+    baselines: Timings = {}
+    if os.path.exists(BASELINES):
+        with open(BASELINES) as fh:
+            baselines = json.load(fh)
+
+    regressions = compare(timings, baselines, args.threshold)
+    if args.save:
+        baselines.update({key: round(value, 6) for key, value in timings.items()})
+        with open(BASELINES, "w") as fh:
+            json.dump(dict(sorted(baselines.items())), fh, indent=2)
+            fh.write("\n")
+        return 0
+
+    if regressions:
+        print(
+            f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}!"
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
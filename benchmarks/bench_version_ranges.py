@@ -0,0 +1,53 @@
+"""Micro-benchmark for matching a dependency against many advisories of a single package.
+
+Compares compiling version ranges and parsing versions on every `is_affected()` call
+(the previous behaviour) with memoised ranges and the shared Version cache.
+
+Usage: PYTHONPATH=src python benchmarks/bench_version_ranges.py
+"""
+import timeit
+from typing import List
+
+from skjold.core import parse_version
+from skjold.sources.gemnasium import GemnasiumSecurityAdvisory
+
+ADVISORIES = 500
+VERSIONS = ["1.11.29", "2.2.28", "3.2.25", "4.2.11", "5.0.4"]
+ROUNDS = 5
+
+
+def make_advisories(count: int) -> List[GemnasiumSecurityAdvisory]:
+    return [
+        GemnasiumSecurityAdvisory.using(
+            {
+                "identifier": f"CVE-2000-{n:04d}",
+                "package_slug": "pypi/Django",
+                "affected_range": f"<1.11.{n % 30}||>=2.2,<2.2.{n % 30}||>=3.{n % 3} <3.{n % 3}.{n % 20}",
+            }
+        )
+        for n in range(count)
+    ]
+
+
+def audit(advisories: List[GemnasiumSecurityAdvisory], memoised: bool) -> None:
+    for version in VERSIONS:
+        for advisory in advisories:
+            if not memoised:
+                advisory._vulnerable_version_range = None
+                parse_version.cache_clear()
+            advisory.is_affected(version)
+
+
+def main() -> None:
+    advisories = make_advisories(ADVISORIES)
+    checks = ADVISORIES * len(VERSIONS)
+
+    for label, memoised in [("uncached", False), ("memoised", True)]:
+        seconds = min(
+            timeit.repeat(lambda: audit(advisories, memoised), number=1, repeat=ROUNDS)
+        )
+        print(f"{label:>8}: {seconds * 1000:8.2f}ms for {checks} checks")
+
+
+if __name__ == "__main__":
+    main()
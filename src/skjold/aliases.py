@@ -0,0 +1,52 @@
+"""Union-find grouping advisory identifiers that describe the same issue (CVE, GHSA, PYSEC, ...)."""
+from typing import Dict, Iterable, List
+
+
+class AliasGraph:
+    """Groups identifiers connected through advisory aliases, transitively."""
+
+    _parent: Dict[str, str]
+    _members: Dict[str, List[str]]
+
+    def __init__(self) -> None:
+        self._parent = {}
+        self._members = {}
+
+    def add(self, identifier: str, aliases: Iterable[str] = ()) -> None:
+        """Record that 'identifier' and all of 'aliases' refer to the same issue."""
+        self.find(identifier)
+        for alias in aliases:
+            # Missing identifiers (None or "") must not merge unrelated issues.
+            if alias:
+                self.union(identifier, alias)
+
+    def find(self, identifier: str) -> str:
+        """Return the representative identifier of the group 'identifier' belongs to."""
+        parent = self._parent.setdefault(identifier, identifier)
+        if parent == identifier:
+            self._members.setdefault(identifier, [identifier])
+            return identifier
+
+        root = self.find(parent)
+        self._parent[identifier] = root
+        return root
+
+    def union(self, first: str, second: str) -> str:
+        """Merge the groups of both identifiers and return the new representative."""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return first
+
+        # Merge the smaller group into the larger one to keep paths short.
+        if len(self._members[first]) < len(self._members[second]):
+            first, second = second, first
+        self._parent[second] = first
+        self._members[first].extend(self._members.pop(second))
+        return first
+
+    def group(self, identifier: str) -> List[str]:
+        """Return all identifiers known to describe the same issue as 'identifier'."""
+        return list(self._members[self.find(identifier)])
+
+    def __contains__(self, identifier: object) -> bool:
+        return identifier in self._parent
@@ -0,0 +1,174 @@
+"""Helpers for reading advisory databases distributed as gzipped tarballs."""
+import collections
+import itertools
+import multiprocessing
+import tarfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Any, Callable, Deque, Iterable, Iterator, List, Sequence, Tuple
+
+import yaml
+
+from skjold import timings
+from skjold.core import SkjoldException
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader  # type: ignore[assignment]
+
+# Archives with fewer matching members are parsed in-process as starting workers isn't worth it.
+PARALLEL_MIN_MEMBERS = 1000
+# Number of members handed to a worker at once.
+PARALLEL_CHUNK_SIZE = 100
+
+# Held while a process pool parses an archive so concurrently loaded sources don't add up workers.
+_pool_lock = threading.Lock()
+
+
+def iter_tarball_members(
+    path: str, predicate: Callable[[str], bool]
+) -> Iterator[Tuple[str, IO[bytes]]]:
+    """Walk the gzipped tarball at 'path' once and yield regular members matching 'predicate'.
+
+    Yields (name, file object) tuples. A file object is only readable until the next member is
+    requested as the archive is consumed as a stream.
+    """
+    with tarfile.open(path, mode="r|gz") as archive:
+        while True:
+            member = archive.next()
+            if member is None:
+                break
+
+            # TarFile remembers every member it has seen; we never look back so drop them.
+            archive.members = []  # type: ignore[attr-defined]
+
+            if not member.isfile() or not predicate(member.name):
+                continue
+
+            fh = archive.extractfile(member)
+            if fh is None:  # pragma: no cover
+                raise SkjoldException(
+                    f"Unable to extract '{member.name}' from source archive."
+                )
+            yield member.name, fh
+
+
+def load_yaml(stream: Any) -> Any:
+    """Parse a single YAML document using libyaml if available."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def _load_yaml_documents(streams: Sequence[bytes]) -> List[Any]:
+    return [load_yaml(stream) for stream in streams]
+
+
+def iter_yaml_members(
+    path: str,
+    predicate: Callable[[str], bool],
+    max_workers: int = 1,
+    min_members: int = PARALLEL_MIN_MEMBERS,
+) -> Iterator[Tuple[str, Any]]:
+    """Yield (name, document) for every YAML member matching 'predicate' in archive order.
+
+    Members are read and parsed one at a time. If 'max_workers' is above 1, members after the first
+    'min_members' are read in chunks and parsed by a pool of up to 'max_workers' processes, keeping
+    only a few chunks in memory. Only one pool runs per process; archives read while it is busy are
+    parsed in-process.
+    """
+    members = iter_tarball_members(path, predicate)
+    if max_workers <= 1:
+        yield from _parse_members(members)
+        return
+
+    # Starting workers only pays off once an archive turns out to be large.
+    yield from _parse_members(itertools.islice(members, min_members))
+    yield from _parse_members_in_parallel(members, max_workers)
+
+
+def _parse_members(
+    members: Iterable[Tuple[str, IO[bytes]]]
+) -> Iterator[Tuple[str, Any]]:
+    for name, fh in members:
+        with timings.phase("archive/read"):
+            data = fh.read()
+        with timings.phase("archive/yaml"):
+            document = load_yaml(data)
+        timings.count("archive members parsed")
+        yield name, document
+
+
+def _read_chunks(
+    members: Iterator[Tuple[str, IO[bytes]]]
+) -> Iterator[Tuple[List[str], List[bytes]]]:
+    """Yield (names, contents) of up to PARALLEL_CHUNK_SIZE members at a time."""
+    while True:
+        with timings.phase("archive/read"):
+            chunk = [
+                (name, fh.read())
+                for name, fh in itertools.islice(members, PARALLEL_CHUNK_SIZE)
+            ]
+        if not chunk:
+            return
+        names, streams = zip(*chunk)
+        yield list(names), list(streams)
+
+
+def _pool_context() -> Any:
+    # Forking a process running other threads (e.g. sources loaded concurrently) may deadlock.
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn"
+    )
+
+
+def _parse_members_in_parallel(
+    members: Iterator[Tuple[str, IO[bytes]]], max_workers: int
+) -> Iterator[Tuple[str, Any]]:
+    chunks = _read_chunks(members)
+    first = next(chunks, None)
+    if first is None:
+        return
+
+    if not _pool_lock.acquire(blocking=False):
+        yield from _parse_chunks(itertools.chain([first], chunks))
+        return
+
+    try:
+        try:
+            executor = ProcessPoolExecutor(max_workers, mp_context=_pool_context())
+        except (ImportError, NotImplementedError, OSError):  # pragma: no cover
+            # Platforms without working process pools (e.g. missing sem_open) parse in-process.
+            yield from _parse_chunks(itertools.chain([first], chunks))
+            return
+
+        with executor:
+            pending: Deque[Tuple[List[str], "Future[List[Any]]"]] = collections.deque()
+            for names, streams in itertools.chain([first], chunks):
+                pending.append((names, executor.submit(_load_yaml_documents, streams)))
+                # Keep every worker busy without reading the whole archive ahead.
+                while len(pending) > 2 * max_workers:
+                    yield from _collect(*pending.popleft())
+            while pending:
+                yield from _collect(*pending.popleft())
+    finally:
+        _pool_lock.release()
+
+
+def _parse_chunks(
+    chunks: Iterable[Tuple[List[str], List[bytes]]]
+) -> Iterator[Tuple[str, Any]]:
+    for names, streams in chunks:
+        with timings.phase("archive/yaml"):
+            documents = _load_yaml_documents(streams)
+        timings.count("archive members parsed", len(documents))
+        yield from zip(names, documents)
+
+
+def _collect(
+    names: List[str], future: "Future[List[Any]]"
+) -> Iterator[Tuple[str, Any]]:
+    with timings.phase("archive/yaml"):
+        documents = future.result()
+    timings.count("archive members parsed", len(documents))
+    yield from zip(names, documents)
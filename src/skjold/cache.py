@@ -0,0 +1,109 @@
+"""Helpers for maintaining files within the skjold cache directory."""
+import contextlib
+import hashlib
+import json
+import os
+from typing import IO, Any, Iterator, Optional, Tuple
+
+# Bump whenever the layout of stored advisories changes to invalidate existing snapshots.
+SNAPSHOT_VERSION = 6
+
+Fingerprint = Tuple[int, str]
+
+
+def _umask() -> int:
+    # The umask can only be read by setting it; done once on import before any threads are started.
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+# Permissions of files written by `atomic_write`, the same `open()` would use.
+_FILE_MODE = 0o666 & ~_umask()
+
+
+def fingerprint(path: str) -> Fingerprint:
+    """Return a (size, sha256) tuple identifying the current contents of 'path'.
+
+    The mtime is deliberately left out as revalidated caches get touched without changing. Hashing
+    large caches takes a while, so the digest is kept in '<path>.fingerprint' and only computed
+    again once the size, mtime or inode of 'path' change.
+    """
+    stat = os.stat(path)
+    key = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+    fingerprint_path = f"{path}.fingerprint"
+    try:
+        with open(fingerprint_path, "rb") as fh:
+            stored = json.load(fh)
+        if stored["stat"] == key:
+            return stat.st_size, str(stored["sha256"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    with contextlib.suppress(OSError):
+        with atomic_write(fingerprint_path, "w") as fh:
+            json.dump({"stat": key, "sha256": digest.hexdigest()}, fh)
+    return stat.st_size, digest.hexdigest()
+
+
+@contextlib.contextmanager
+def atomic_write(path: str, mode: str = "wb") -> Iterator[IO[Any]]:
+    """Write to a temporary file next to 'path' and move it into place once done."""
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        with os.fdopen(fd, mode) as fh:
+            yield fh
+        # mkstemp() creates files only readable by their owner.
+        os.chmod(tmp_path, _FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+
+
+def read_snapshot(path: str, fingerprint_: Fingerprint) -> Optional[Any]:
+    """Return the payload stored at 'path' if it was created from a raw cache matching 'fingerprint_'."""
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as fh:
+            snapshot = json.load(fh)
+        version, stored_fingerprint, payload = (
+            snapshot["version"],
+            snapshot["fingerprint"],
+            snapshot["payload"],
+        )
+    except Exception:
+        # Treat unreadable, truncated or foreign snapshots as missing.
+        return None
+
+    if version != SNAPSHOT_VERSION or tuple(stored_fingerprint) != fingerprint_:
+        return None
+
+    return payload
+
+
+def write_snapshot(path: str, fingerprint_: Fingerprint, payload: Any) -> None:
+    """Persist JSON serializable 'payload' along with the fingerprint of the raw cache it was built from.
+
+    Snapshots only hold plain data so a tampered cache directory can't run code when loading them.
+    """
+    # Serialized at once, json.dump() writes each token separately and is a lot slower.
+    data = json.dumps(
+        {"version": SNAPSHOT_VERSION, "fingerprint": fingerprint_, "payload": payload},
+        # Advisories parsed from YAML may contain dates.
+        default=str,
+    )
+    with atomic_write(path, "w") as fh:
+        fh.write(data)
@@ -4,19 +4,27 @@ __version__ = "0.6.2"
 import datetime
 import os
 import sys
-from typing import List, TextIO
+from typing import Any, Dict, Iterable, List, Optional, TextIO
 
 import click
 
-import skjold.sources
-from skjold.formats import Format, extract_dependencies_from_files
+from skjold import timings
+from skjold.core import SkjoldException
+from skjold.formats import (
+    Format,
+    discover_dependency_files,
+    extract_dependencies_from_files,
+    extract_dependencies_from_paths,
+)
 from skjold.ignore import SkjoldIgnore
 from skjold.tasks import (
+    REPORT_FORMATS,
+    STORAGE_BACKENDS,
     Configuration,
-    audit,
     default_from_context,
     get_configuration_from_toml,
     get_registered_sources,
+    iter_audit,
     print_configuration,
     report,
 )
@@ -105,7 +113,7 @@ def config_(config: Configuration) -> None:
     "report_format",
     "-o",
     "--report-format",
-    type=click.Choice(["json", "cli"], case_sensitive=True),
+    type=click.Choice(REPORT_FORMATS, case_sensitive=True),
     cls=default_from_context("report_format", Configuration),
     help="Output format",
     show_default=True,
@@ -138,6 +146,67 @@ def config_(config: Configuration) -> None:
     show_default=False,
     multiple=True,
 )
+@click.option(
+    "jobs",
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    cls=default_from_context("jobs", Configuration),
+    help="Maximum number of sources to update and load, files to read or processes parsing a large archive concurrently.",
+    show_default=True,
+)
+@click.option(
+    "storage",
+    "--storage",
+    type=click.Choice(STORAGE_BACKENDS),
+    cls=default_from_context("storage", Configuration),
+    help="Keep parsed advisories in snapshot files or a SQLite database.",
+    show_default=True,
+)
+@click.option(
+    "deduplicate",
+    "--deduplicate/--no-deduplicate",
+    cls=default_from_context("deduplicate", Configuration),
+    help="Merge findings of the same issue reported by several sources (not for ndjson).",
+    show_default=True,
+)
+@click.option(
+    "server",
+    "--server",
+    envvar="SKJOLD_SERVER",
+    type=str,
+    default=None,
+    help="Audit using a running 'skjold serve' at HOST:PORT or unix:PATH.",
+)
+@click.option(
+    "recursive",
+    "-R",
+    "--recursive",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Also audit all supported dependency files found below this directory.",
+)
+@click.option(
+    "show_timings",
+    "--timings",
+    is_flag=True,
+    default=False,
+    help="Print wall time, CPU time and peak memory per phase and counters to stderr.",
+)
+@click.option(
+    "timings_file",
+    "--timings-file",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write timings and counters as JSON to this file.",
+)
+@click.option(
+    "profile_out",
+    "--profile-out",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Profile the audit using cProfile and write the statistics to this file.",
+)
 @click.argument("files", nargs=-1, type=click.File())
 @configuration
 def audit_(
@@ -147,6 +216,14 @@ def audit_(
     file_format: str,
     ignore_file: str,
     sources: List[str],
+    jobs: int,
+    storage: str,
+    deduplicate: bool,
+    server: Optional[str],
+    recursive: Optional[str],
+    show_timings: bool,
+    timings_file: Optional[str],
+    profile_out: Optional[str],
     files: List[TextIO],
 ) -> None:
     """
@@ -158,19 +235,46 @@ def audit_(
     config.report_only = report_only
     config.report_format = report_format
     config.ignore_file = ignore_file
+    config.jobs = jobs
+    config.storage = storage
+    config.deduplicate = deduplicate
+
+    # Timings and profiles are written once the command is done, even if it exits non-zero.
+    ctx = click.get_current_context()
+    if profile_out:
+        ctx.with_resource(timings.profiled(profile_out))
+    if show_timings or timings_file:
+        ctx.with_resource(timings.recording(show_timings, timings_file))
 
     # Only override sources if at least once --source is passed.
     if len(sources) > 0:
-        config.sources = list(set(sources))
+        config.sources = list(dict.fromkeys(sources))
 
-    if len(config.sources) == 0:
+    # A server falls back to the sources it has been configured with.
+    if len(config.sources) == 0 and not server:
         raise click.ClickException(
             click.style(
                 "Please specify or configure at least one advisory source!", fg="red"
             )
         )
 
-    packages = list(extract_dependencies_from_files(config, files, file_format))
+    with timings.phase("parse"):
+        packages = list(extract_dependencies_from_files(config, files, file_format))
+
+    if recursive:
+        paths = discover_dependency_files(recursive)
+        if len(paths) == 0:
+            raise click.ClickException(
+                f"No supported dependency files found below '{recursive}'!"
+            )
+        if config.verbose:
+            click.secho("Found ", nl=False, err=True)
+            click.secho(f"{len(paths)}", fg="green", nl=False, err=True)
+            click.secho(f" dependency file(s) below '{recursive}'.", err=True)
+
+        # Dependencies keep the file they were read from and findings refer back to it.
+        with timings.phase("parse"):
+            packages.extend(extract_dependencies_from_paths(paths, config.jobs))
 
     if config.verbose:
         click.secho("Checking ", nl=False, err=True)
@@ -183,9 +287,23 @@ def audit_(
 
     ignore = SkjoldIgnore.using(config.ignore_file)
 
-    findings = audit(config, packages, ignore=ignore)
+    findings: Iterable[Dict[str, Any]]
+    if server:
+        from skjold.server import audit_remote
+
+        try:
+            with timings.phase("remote"):
+                findings = audit_remote(
+                    server, packages, ignore, config.sources, config.merges_findings
+                )
+        except SkjoldException as exc:
+            raise click.ClickException(str(exc))
+    else:
+        findings = iter_audit(config, packages, ignore=ignore)
 
-    vulnerable_packages, _ = report(config, findings)
+    # Streaming formats match dependencies while reporting, so 'report' includes '*/match'.
+    with timings.phase("report"):
+        vulnerable_packages, _ = report(config, findings)
 
     # By default we want to exit with a non-zero exit-code when we encounter
     # any findings.
@@ -193,6 +311,91 @@ def audit_(
         sys.exit(1)
 
 
+@cli.command("serve")  # pragma: no cover
+@click.option(
+    "bind",
+    "-b",
+    "--bind",
+    type=str,
+    default="127.0.0.1:8765",
+    help="Address to listen on, either HOST:PORT or unix:PATH.",
+    show_default=True,
+)
+@click.option(
+    "sources",
+    "-s",
+    "--sources",
+    type=click.Choice(get_registered_sources(), case_sensitive=True),
+    cls=default_from_context("sources", Configuration),
+    help="Identifier of a registered advisory source.",
+    show_default=False,
+    multiple=True,
+)
+@click.option(
+    "storage",
+    "--storage",
+    type=click.Choice(STORAGE_BACKENDS),
+    cls=default_from_context("storage", Configuration),
+    help="Keep parsed advisories in snapshot files or a SQLite database.",
+    show_default=True,
+)
+@click.option(
+    "refresh_interval",
+    "--refresh-interval",
+    type=click.IntRange(min=0),
+    default=300,
+    help="Seconds between background checks for outdated sources (0 to disable).",
+    show_default=True,
+)
+@configuration
+def serve_(
+    config: Configuration,
+    bind: str,
+    sources: List[str],
+    storage: str,
+    refresh_interval: int,
+) -> None:
+    """
+    Keeps advisory sources loaded and audits dependencies sent via `audit --server`.
+
+    \b
+    POST /audit   Audit a JSON document containing dependencies or files.
+    GET  /status  Show the sources served and when they were last refreshed.
+    """
+    config.storage = storage
+    if len(sources) > 0:
+        config.sources = list(dict.fromkeys(sources))
+
+    if len(config.sources) == 0:
+        raise click.ClickException(
+            click.style(
+                "Please specify or configure at least one advisory source!", fg="red"
+            )
+        )
+
+    from skjold.server import create_server
+
+    try:
+        server = create_server(config, bind)
+    except (OSError, SkjoldException) as exc:
+        raise click.ClickException(f"Unable to listen on '{bind}': {exc}")
+
+    click.secho("Loading ", nl=False, err=True)
+    click.secho(f"{config.sources}", fg="green", nl=False, err=True)
+    click.secho(" ...", err=True)
+    server.preload()
+    if refresh_interval > 0:
+        server.start_refresh(refresh_interval)
+
+    click.secho(f"Listening on {bind}", fg="green", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
 @cli.command("ignore")  # pragma: no cover
 @click.option(
     "reason",
@@ -1,17 +1,46 @@
 import abc
+import functools
 import os
 import time
 from abc import ABCMeta, abstractmethod
 from dataclasses import dataclass
-from typing import List, MutableMapping, Optional, Sequence, Tuple
-
-from packaging.utils import NormalizedName, canonicalize_name
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+from skjold import timings
+from skjold.cache import Fingerprint, fingerprint, read_snapshot, write_snapshot
+from skjold.versions import VersionIndex, parse_version
+
+if TYPE_CHECKING:  # pragma: no cover
+    from packaging.specifiers import SpecifierSet
+    from packaging.utils import NormalizedName
+
+    from skjold.store import AdvisoryStore
 
 
 class SkjoldException(Exception):
     pass
 
 
+@functools.lru_cache(maxsize=4096)
+def canonicalize_name(name: str) -> "NormalizedName":
+    """Return the normalized form of the given package name (PEP 503)."""
+    # packaging is only imported once names are needed; the cli starts faster without it.
+    from packaging.utils import canonicalize_name as _canonicalize_name
+
+    return _canonicalize_name(name)
+
+
 @dataclass(frozen=True)
 class Dependency:
     name: str
@@ -19,7 +48,7 @@ class Dependency:
     source: Tuple[str, Optional[int]] = ("<unknown>", None)
 
     @property
-    def canonical_name(self) -> NormalizedName:
+    def canonical_name(self) -> "NormalizedName":
         return canonicalize_name(self.name)
 
 
@@ -63,6 +92,20 @@ class SecurityAdvisory(metaclass=abc.ABCMeta):
         """Return list of references for this advisory."""
         raise NotImplementedError
 
+    @property
+    def aliases(self) -> List[str]:
+        """Return other identifiers of the same issue (e.g. CVE, GHSA or PYSEC ids)."""
+        return []
+
+    def to_json(self) -> Dict[str, Any]:
+        """Return the plain data needed to rebuild this advisory using `from_json`."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_json(cls, json_: Dict[str, Any]) -> "SecurityAdvisory":
+        """Return the advisory described by data previously returned by `to_json`."""
+        raise NotImplementedError
+
     @property
     @abstractmethod
     def summary(self) -> str:
@@ -86,6 +129,11 @@ class SecurityAdvisory(metaclass=abc.ABCMeta):
         """Return True if the given version is within the affected version range. False otherwise."""
         raise NotImplementedError
 
+    @property
+    def affected_specifiers(self) -> Optional[Sequence["SpecifierSet"]]:
+        """Return the specifier sets describing affected versions or None if they are unknown."""
+        return None
+
 
 SecurityAdvisoryList = List[SecurityAdvisory]
 
@@ -98,14 +146,43 @@ def is_outdated(path: str, max_age: int = 3600) -> bool:
 
 
 class SecurityAdvisorySource(metaclass=ABCMeta):
-    _advisories: MutableMapping[NormalizedName, SecurityAdvisoryList] = {}
+    _advisories: MutableMapping["NormalizedName", SecurityAdvisoryList]
     _cache_dir: str
     _cache_expires: int
+    _indexes: Dict[
+        "NormalizedName",
+        Tuple[SecurityAdvisoryList, int, VersionIndex[SecurityAdvisory]],
+    ]
+    # Maximum number of worker processes used to parse the cache.
+    _jobs: int = 1
+    _loaded: bool = False
     _name: str
+    _packages: Optional[AbstractSet["NormalizedName"]] = None
+    _store: Optional["AdvisoryStore"] = None
+    _update_checked: bool = False
 
-    def __init__(self, cache_dir: str, cache_expires: int = 0) -> None:
+    # Sources able to restrict `populate_from_cache` to the packages given in `packages`.
+    supports_partial_loading: bool = False
+    # Advisories are only kept in snapshots or an AdvisoryStore if they can be rebuilt using this
+    # type's `from_json`.
+    advisory_type: Optional[Type[SecurityAdvisory]] = None
+
+    def __init__(
+        self,
+        cache_dir: str,
+        cache_expires: int = 0,
+        packages: Optional[AbstractSet["NormalizedName"]] = None,
+        store: Optional["AdvisoryStore"] = None,
+        jobs: int = 1,
+    ) -> None:
         self._cache_dir = cache_dir
         self._cache_expires = cache_expires
+        self._jobs = jobs
+        self._advisories = {}
+        self._indexes = {}
+        self._store = store
+        if packages is not None and self.supports_partial_loading and store is None:
+            self._packages = frozenset(packages)
 
     @property
     @abstractmethod
@@ -114,15 +191,139 @@ class SecurityAdvisorySource(metaclass=ABCMeta):
         raise NotImplementedError
 
     @property
-    def advisories(self) -> MutableMapping[NormalizedName, SecurityAdvisoryList]:
+    def advisories(self) -> MutableMapping["NormalizedName", SecurityAdvisoryList]:
         """Return list of SecurityAdvisories from the given source."""
-        if self.requires_update:
-            self.update()
+        # Only check the local database download once per instance instead of on every access.
+        if not self._update_checked:
+            if self.requires_update:
+                with timings.phase(f"{self.name}/update"):
+                    self.update()
+            self._update_checked = True
+
+        if not self._loaded and not len(self._advisories):
+            with timings.phase(f"{self.name}/load"):
+                self.load()
+            timings.count(f"{self.name}/advisories loaded", self.loaded_count)
+
+        return self._advisories
+
+    def prepare(self) -> None:
+        """Update the local database download if necessary and load its advisories."""
+        _ = self.advisories
+
+    def is_wanted(self, package_name: str) -> bool:
+        """Return True if advisories for the given package should be loaded. False otherwise."""
+        return (
+            self._packages is None or canonicalize_name(package_name) in self._packages
+        )
+
+    def require(self, packages: AbstractSet["NormalizedName"]) -> None:
+        """Ensure advisories for the given packages get loaded, parsing them on demand if necessary."""
+        if self._packages is None or packages <= self._packages:
+            return
 
-        if not len(self._advisories):
+        self._packages = self._packages | packages
+        if self._loaded:
+            self.load()
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        """Return path to the precompiled advisory snapshot next to the local database download."""
+        if self.path is None or self.advisory_type is None:
+            return None
+
+        return f"{self.path}.snapshot"
+
+    def load(self) -> None:
+        """Populate advisories from a matching snapshot or from the local database download.
+
+        Snapshots are keyed on the fingerprint of the raw cache and are rebuilt whenever it changes.
+        Partially loaded sources record the packages a snapshot covers and only parse the missing ones.
+        Sources using an AdvisoryStore keep their complete database in it and query it on access.
+        Neither is used for sources without an `advisory_type`.
+        """
+        self._loaded = True
+        if self.path is None or self.snapshot_path is None:
+            self.populate_from_cache()
+            return
+
+        fingerprint_ = fingerprint(self.path)
+        if self._store is not None:
+            self._load_from_store(self._store, fingerprint_)
+            return
+
+        snapshot = read_snapshot(self.snapshot_path, fingerprint_)
+        wanted = self._packages
+
+        if snapshot is not None:
+            covered = (
+                None
+                if snapshot["packages"] is None
+                else frozenset(snapshot["packages"])
+            )
+            advisories = {
+                name: [self._rebuild(item) for item in items]
+                for name, items in snapshot["advisories"].items()
+            }
+            state = snapshot["state"]
+            if covered is None or (wanted is not None and wanted <= covered):
+                self._advisories = advisories
+                self.from_snapshot(state)
+                self._packages = covered
+                return
+
+            if wanted is not None:
+                # Only parse packages the snapshot doesn't know about yet and merge them.
+                self._packages = wanted - covered
+                self.populate_from_cache()
+                for name, previous in advisories.items():
+                    self._advisories.setdefault(name, []).extend(previous)
+                self._packages = covered | wanted
+
+        if snapshot is None or wanted is None:
             self.populate_from_cache()
 
-        return self._advisories
+        try:
+            write_snapshot(
+                self.snapshot_path,
+                fingerprint_,
+                {
+                    "packages": None
+                    if self._packages is None
+                    else sorted(self._packages),
+                    "advisories": {
+                        name: [advisory.to_json() for advisory in advisories]
+                        for name, advisories in self._advisories.items()
+                    },
+                    "state": self.to_snapshot(),
+                },
+            )
+        except OSError:  # pragma: no cover
+            # Failing to persist the snapshot only costs us a re-parse next time.
+            pass
+
+    def _load_from_store(
+        self, store: "AdvisoryStore", fingerprint_: Fingerprint
+    ) -> None:
+        # The store always holds the complete database of a source.
+        self._packages = None
+        if not store.is_current(self.name, fingerprint_):
+            self.populate_from_cache()
+            store.replace(self.name, fingerprint_, self._advisories, self.to_snapshot())
+
+        self._advisories = store.advisories(self.name, self._rebuild)
+        self.from_snapshot(store.state(self.name))
+
+    def _rebuild(self, json_: Dict[str, Any]) -> SecurityAdvisory:
+        assert self.advisory_type is not None
+        return self.advisory_type.from_json(json_)
+
+    def to_snapshot(self) -> Any:
+        """Return JSON serializable state besides advisories to persist after populating from cache."""
+        return None
+
+    def from_snapshot(self, state: Any) -> None:
+        """Restore state previously returned by `to_snapshot`."""
 
     @property
     def requires_update(self) -> bool:
@@ -167,5 +368,63 @@ class SecurityAdvisorySource(metaclass=ABCMeta):
 
     def get_security_advisories(
         self,
-    ) -> MutableMapping[NormalizedName, SecurityAdvisoryList]:
+    ) -> MutableMapping["NormalizedName", SecurityAdvisoryList]:
         return self.advisories
+
+    @property
+    def loaded_count(self) -> int:
+        """Return number of advisories currently held in memory by this source."""
+        if self._store is not None:
+            from skjold.store import StoredAdvisories
+
+            if isinstance(self._advisories, StoredAdvisories):
+                return self._advisories.loaded_count
+        return sum(len(advisories) for advisories in self._advisories.values())
+
+    def match_many(
+        self, dependencies: DependencyList
+    ) -> List[Tuple[Dependency, Sequence[SecurityAdvisory]]]:
+        """Return (dependency, advisories) for every vulnerable dependency in the given order.
+
+        Each unique (name, version) pair is only evaluated once no matter how many files or lines
+        it appears in; its result is shared by every dependency with the same pair.
+        """
+        self.require({dependency.canonical_name for dependency in dependencies})
+
+        results: Dict[Tuple["NormalizedName", str], Sequence[SecurityAdvisory]] = {}
+        matches = []
+        for dependency in dependencies:
+            key = (dependency.canonical_name, dependency.version)
+            if key not in results:
+                results[key] = []
+                if self.has_security_advisory_for(dependency):
+                    is_vulnerable, advisories = self.is_vulnerable_package(dependency)
+                    if is_vulnerable:
+                        results[key] = advisories
+
+            if results[key]:
+                matches.append((dependency, results[key]))
+
+        timings.count(f"{self.name}/dependencies evaluated", len(results))
+        return matches
+
+    def find_affecting(self, dependency: Dependency) -> SecurityAdvisoryList:
+        """Return advisories affecting the given dependency using a per-package version index."""
+        name = dependency.canonical_name
+        advisories = self.advisories.get(name)
+        if not advisories:
+            return []
+
+        # Indexes are built lazily and rebuilt once the advisories for a package change.
+        built_from, size, index = self._indexes.get(name, (None, 0, None))
+        if index is None or built_from is not advisories or size != len(advisories):
+            index = VersionIndex(advisories, lambda item: item.affected_specifiers)
+            self._indexes[name] = (advisories, len(advisories), index)
+
+        candidates = index.candidates(parse_version(dependency.version))
+        timings.count("specifier evaluations", len(candidates))
+        return [
+            advisory
+            for advisory in candidates
+            if advisory.is_affected(dependency.version)
+        ]
@@ -1,5 +1,7 @@
+import functools
+import itertools
 import math
-from typing import Any, Dict, Union
+from typing import Any, Dict, Iterable, Tuple, Union
 
 
 def round_up(n: float, decimals: int = 1) -> float:
@@ -7,10 +9,64 @@ def round_up(n: float, decimals: int = 1) -> float:
     return float(math.ceil(n * multiplier) / multiplier)
 
 
-class CVSS2:
+ScoreTable = Dict[Tuple[str, ...], Tuple[float, str]]
+
+# Score and severity of every combination of base metrics per CVSS version, built on first use.
+_score_tables: Dict[type, ScoreTable] = {}
+
+
+class CVSS:
+    """Base metrics of a CVSS vector. Scores are looked up in a table covering all base metrics."""
 
     _basic: Dict[str, str] = {}
+    # Base metrics in the order used to key the score table.
+    _order: Tuple[str, ...] = ()
+    _metrics: Dict[str, Any] = {}
+
+    @classmethod
+    def _metric_values(cls) -> Dict[str, Iterable[str]]:
+        return {metric: cls._metrics[metric] for metric in cls._order}
+
+    @classmethod
+    def _score_table(cls) -> ScoreTable:
+        table = _score_tables.get(cls)
+        if table is None:
+            table = {}
+            values = cls._metric_values()
+            for key in itertools.product(*[values[metric] for metric in cls._order]):
+                obj = cls()
+                obj._basic = dict(zip(cls._order, key))
+                score = obj._base_score()
+                table[key] = (score, cls._severity_of(score))
+            _score_tables[cls] = table
+        return table
+
+    @property
+    def _key(self) -> Tuple[str, ...]:
+        return tuple(self._basic[metric] for metric in self._order)
+
+    def _base_score(self) -> float:
+        raise NotImplementedError
+
+    @staticmethod
+    def _severity_of(score: float) -> str:
+        raise NotImplementedError
+
+    @property
+    def score(self) -> float:
+        """Return the base score."""
+        return self._score_table()[self._key][0]
+
+    @property
+    def severity(self) -> str:
+        """Return severity level based on the base score."""
+        return self._score_table()[self._key][1]
+
+
+class CVSS2(CVSS):
+
     _fields_basic_group = frozenset({"AV", "AC", "Au", "C", "I", "A"})
+    _order = ("AV", "AC", "Au", "C", "I", "A")
     _metrics: Dict[str, Any] = {
         "AV": {"N": 1.0, "A": 0.646, "L": 0.395},
         "AC": {"L": 0.71, "M": 0.61, "H": 0.35},
@@ -53,36 +109,34 @@ class CVSS2:
         """Calculate the impact score."""
         return 10.41 * self._impact_subscore
 
-    @property
-    def score(self) -> float:
-        """Return the CVSS 2.0 base score."""
-        if self.impact_score <= 0:
+    def _base_score(self) -> float:
+        """Calculate the CVSS 2.0 base score."""
+        impact_score = self.impact_score
+        if impact_score <= 0:
             return 0.0
 
         return round(
-            1.176
-            * ((0.6 * self.impact_score) + (0.4 * self.exploitability_score) - 1.5),
+            1.176 * ((0.6 * impact_score) + (0.4 * self.exploitability_score) - 1.5),
             1,
         )
 
-    @property
-    def severity(self) -> str:
+    @staticmethod
+    def _severity_of(score: float) -> str:
         """Return severity level for based on the CVSS 2.0 base score."""
-        x = self.score
-        if x < 0.001:
+        if score < 0.001:
             return "NONE"
-        elif x < 4:
+        elif score < 4:
             return "LOW"
-        elif x < 7:
+        elif score < 7:
             return "MEDIUM"
         else:
             return "HIGH"
 
 
-class CVSS3:
+class CVSS3(CVSS):
 
-    _basic: Dict[str, str] = {}
     _fields_basic_group = frozenset({"AV", "AC", "PR", "UI", "S", "C", "I", "A"})
+    _order = ("AV", "AC", "PR", "UI", "S", "C", "I", "A")
     _metrics: Dict[str, Any] = {
         "AV": {"N": 0.85, "A": 0.62, "L": 0.55, "P": 0.2},
         "AC": {"L": 0.77, "H": 0.44},
@@ -96,6 +150,15 @@ class CVSS3:
         "A": {"H": 0.56, "L": 0.22, "N": 0.0},
     }
 
+    @classmethod
+    def _metric_values(cls) -> Dict[str, Iterable[str]]:
+        # Weights of privileges required depend on the scope.
+        return {
+            **{metric: cls._metrics[metric] for metric in cls._order if metric != "S"},
+            "PR": cls._metrics["PR"]["U"],
+            "S": cls._metrics["PR"],
+        }
+
     @classmethod
     def using(cls, vector: str) -> "CVSS3":
         kv = map(lambda v: v.split(":"), vector.strip().upper().split("/"))
@@ -139,35 +202,34 @@ class CVSS3:
 
         return 7.52 * (impact_subscore - 0.029) - 3.25 * (impact_subscore - 0.02) ** 15
 
-    @property
-    def score(self) -> float:
-        """Return the CVSS 3.0 base score."""
-        if self.impact_score <= 0:
+    def _base_score(self) -> float:
+        """Calculate the CVSS 3.0 base score."""
+        impact_score = self.impact_score
+        if impact_score <= 0:
             return 0.0
 
         if self.scope == "U":
-            return round_up(min((self.impact_score + self.exploitability_score), 10.0))
+            return round_up(min((impact_score + self.exploitability_score), 10.0))
 
-        return round_up(
-            min(1.08 * (self.impact_score + self.exploitability_score), 10.0)
-        )
+        return round_up(min(1.08 * (impact_score + self.exploitability_score), 10.0))
 
-    @property
-    def severity(self) -> str:
+    @staticmethod
+    def _severity_of(score: float) -> str:
         """Return severity level for based on the CVSS 3.0 base score."""
-        x = self.score
-        if x < 0.001:
+        if score < 0.001:
             return "NONE"
-        elif x < 4.0:
+        elif score < 4.0:
             return "LOW"
-        elif x < 7.0:
+        elif score < 7.0:
             return "MEDIUM"
-        elif x < 9.0:
+        elif score < 9.0:
             return "HIGH"
         else:
             return "CRITICAL"
 
 
+# Parsed vectors are shared; advisories mostly use a handful of distinct vectors.
+@functools.lru_cache(maxsize=None)
 def parse_cvss(vector: str) -> Union[CVSS2, CVSS3]:
     if vector.startswith("CVSS:3"):
         return CVSS3.using(vector)
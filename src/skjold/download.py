@@ -0,0 +1,136 @@
+"""Helpers for downloading advisory databases into the skjold cache directory."""
+import contextlib
+import gzip
+import json
+import os
+import urllib.error
+import urllib.request
+import zlib
+from typing import IO, Callable, Dict, Mapping, Optional
+
+from skjold import timings
+from skjold.cache import atomic_write
+from skjold.core import SkjoldException
+
+CHUNK_SIZE = 64 * 1024
+
+# Response headers kept next to a download and the request headers used to revalidate it.
+_VALIDATORS = {"ETag": "If-None-Match", "Last-Modified": "If-Modified-Since"}
+
+
+def verify_gzip(fh: IO[bytes]) -> None:
+    """Raise SkjoldException unless 'fh' contains a complete gzip stream."""
+    try:
+        with gzip.GzipFile(fileobj=fh, mode="rb") as archive:
+            while archive.read(CHUNK_SIZE):
+                pass
+    except (EOFError, OSError, zlib.error) as exc:
+        raise SkjoldException(f"Downloaded archive is corrupt: {exc}") from exc
+
+
+def verify_json(fh: IO[bytes]) -> None:
+    """Raise SkjoldException unless 'fh' looks like a complete JSON object.
+
+    Only both ends are checked so memory use doesn't grow with the download. The document is parsed
+    once it is loaded.
+    """
+    head = fh.read(CHUNK_SIZE).lstrip()
+    fh.seek(0, os.SEEK_END)
+    fh.seek(max(0, fh.tell() - CHUNK_SIZE))
+    tail = fh.read().rstrip()
+    if not head.startswith(b"{") or not tail.endswith(b"}"):
+        raise SkjoldException(
+            "Downloaded database is corrupt: Not a complete JSON object."
+        )
+
+
+def _read_validators(path: str, url: str) -> Dict[str, str]:
+    """Return validators stored at 'path' if they were recorded for 'url'."""
+    try:
+        with open(path, "r") as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(meta, dict) or meta.get("url") != url:
+        return {}
+
+    return {
+        name: str(value)
+        for name, value in meta.get("validators", {}).items()
+        if name in _VALIDATORS
+    }
+
+
+def _write_validators(path: str, url: str, validators: Mapping[str, str]) -> None:
+    with contextlib.suppress(OSError):
+        if not validators:
+            if os.path.exists(path):
+                os.unlink(path)
+            return
+
+        with atomic_write(path, "w") as fh:
+            json.dump({"url": url, "validators": dict(validators)}, fh)
+
+
+def download(
+    url: str,
+    path: str,
+    headers: Optional[Mapping[str, str]] = None,
+    verify: Optional[Callable[[IO[bytes]], None]] = None,
+) -> bool:
+    """Stream the response body for 'url' to 'path' in chunks.
+
+    The body is written to a temporary file next to 'path' which only replaces 'path' once the
+    download is complete and passed 'verify'. An interrupted or corrupt download leaves any
+    existing file at 'path' untouched.
+
+    Upstream validators (ETag, Last-Modified) are kept in '<path>.meta' and used to send a
+    conditional request next time. If upstream reports the file as unchanged 'path' is only
+    touched and False is returned. Returns True if a new file was downloaded.
+    """
+    meta_path = f"{path}.meta"
+    headers_ = dict(headers or {})
+    if os.path.exists(path):
+        for name, value in _read_validators(meta_path, url).items():
+            headers_[_VALIDATORS[name]] = value
+
+    request_ = urllib.request.Request(url=url, headers=headers_)
+    timings.count("http requests")
+    try:
+        response = urllib.request.urlopen(request_)
+    except urllib.error.HTTPError as exc:
+        if exc.code != 304:
+            raise
+        exc.close()
+        os.utime(path)
+        return False
+
+    with response, atomic_write(path, "w+b") as fh:
+        size = 0
+        for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+            fh.write(chunk)
+            size += len(chunk)
+
+        content_length = response.headers.get("Content-Length")
+        if content_length is not None and size != int(content_length):
+            raise SkjoldException(
+                f"Incomplete download from {url}: got {size} of {content_length} bytes."
+            )
+        timings.count("bytes downloaded", size)
+
+        if verify is not None:
+            fh.flush()
+            fh.seek(0)
+            verify(fh)
+
+    _write_validators(
+        meta_path,
+        url,
+        {
+            name: response.headers[name]
+            for name in _VALIDATORS
+            if response.headers.get(name)
+        },
+    )
+    return True
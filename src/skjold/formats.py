@@ -1,6 +1,14 @@
 import json
 import os
-from typing import Callable, Iterator, MutableMapping, Optional, Sequence, TextIO
+from typing import (
+    Callable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    TextIO,
+)
 
 import click
 import toml
@@ -8,6 +16,9 @@ import toml
 from skjold.core import Dependency, SkjoldException
 from skjold.tasks import Configuration
 
+# Fewer discovered files are read in-process as starting workers isn't worth it.
+PARALLEL_MIN_FILES = 8
+
 
 def read_poetry_lock_from(file: TextIO) -> Iterator[Dependency]:
     """Reads a poetry.lock given by path and yields 'package==version' items."""
@@ -107,3 +118,53 @@ def _extract_package_list_from(
         raise SkjoldException(f"Unsupported file or format '{format_}'!")
 
     yield from reader_func(file)
+
+
+def discover_dependency_files(root: str) -> List[str]:
+    """Return paths of all files below 'root' named like one of the supported formats.
+
+    Hidden directories (e.g. '.git', '.venv' or '.tox') are skipped. Paths are sorted.
+    """
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for filename in filenames:
+            if filename in Format.SUPPORTED_FORMATS:
+                paths.append(os.path.join(dirpath, filename))
+    return sorted(paths)
+
+
+def _read_dependencies_from_path(path: str) -> List[Dependency]:
+    reader_func = Format.SUPPORTED_FORMATS[os.path.basename(path)]
+    with open(path) as file:
+        return list(reader_func(file))
+
+
+def extract_dependencies_from_paths(
+    paths: Sequence[str],
+    max_workers: Optional[int] = None,
+    min_files: int = PARALLEL_MIN_FILES,
+) -> Iterator[Dependency]:
+    """Read dependencies from files named like one of the supported formats in the given order.
+
+    Once at least 'min_files' paths are given, they are read by a pool of 'max_workers' processes
+    (defaults to the number of CPUs).
+    """
+    workers = max_workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) < min_files:
+        for path in paths:
+            yield from _read_dependencies_from_path(path)
+        return
+
+    # Importing multiprocessing is only worth it when actually reading files in parallel.
+    from concurrent.futures import ProcessPoolExecutor
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_read_dependencies_from_path, paths))
+    except (NotImplementedError, OSError):  # pragma: no cover
+        # Platforms without working process pools (e.g. missing sem_open) read in-process.
+        results = [_read_dependencies_from_path(path) for path in paths]
+
+    for dependencies in results:
+        yield from dependencies
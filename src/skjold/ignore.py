@@ -1,13 +1,20 @@
 import datetime
 import os
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Optional, Tuple
 
-import yaml
-from packaging.utils import canonicalize_name
+import click
+
+from skjold.core import canonicalize_name
+
+if TYPE_CHECKING:  # pragma: no cover
+    from packaging.utils import NormalizedName
+
+IgnoreIndex = Dict[Tuple[str, "NormalizedName"], Tuple[datetime.datetime, Dict]]
 
 
 class SkjoldIgnore:
     _doc: Dict
+    _index: Optional[IgnoreIndex] = None
     _path: str
 
     EXPIRES_FMT = "%Y-%m-%dT%H:%M:%S%z"
@@ -24,10 +31,25 @@ class SkjoldIgnore:
         if not os.path.exists(path):
             return obj
 
+        # PyYAML takes a while to import and is not needed without an ignore file.
+        import yaml
+
         with open(path) as fh:
             obj._doc = yaml.safe_load(fh)
+        obj._index = None
         return obj
 
+    @classmethod
+    def using_document(cls, path: str, doc: Dict) -> "SkjoldIgnore":
+        obj = SkjoldIgnore(path)
+        obj._doc = doc
+        obj._index = None
+        return obj
+
+    @property
+    def document(self) -> Dict:
+        return dict(self._doc)
+
     @property
     def version(self) -> str:
         return str(self._doc["version"])
@@ -45,7 +67,6 @@ class SkjoldIgnore:
         expires: datetime.datetime = datetime.datetime.now()
         + datetime.timedelta(days=14),
     ) -> bool:
-
         expires = expires.replace(tzinfo=datetime.timezone.utc)
 
         if identifier not in self.entries:
@@ -58,22 +79,55 @@ class SkjoldIgnore:
                 "expires": expires.strftime(SkjoldIgnore.EXPIRES_FMT),
             }
         )
+        self._index = None
         return True
 
     def save(self) -> None:
+        import yaml
+
         with open(self._path, "w") as fh:
             yaml.safe_dump(self._doc, fh)
 
-    def should_ignore(self, identifier: str, package_name: str) -> Tuple[bool, Dict]:
-        """Returns True a given identifier has an entry in the blacklist."""
-        if identifier not in self.entries:
+    def _compile(self) -> IgnoreIndex:
+        """Index entries by identifier and canonical package name with parsed expiry dates.
+
+        Invalid entries are skipped with a warning so a single typo in a shared ignore file doesn't
+        break every audit.
+        """
+        index: IgnoreIndex = {}
+        for identifier, entries in (self._doc.get("ignore") or {}).items():
+            for entry in entries or []:
+                try:
+                    expires = datetime.datetime.strptime(
+                        f"{entry['expires']}", SkjoldIgnore.EXPIRES_FMT
+                    )
+                    package = canonicalize_name(str(entry["package"]))
+                except (KeyError, TypeError, ValueError) as exc:
+                    click.secho("Warning! ", err=True, nl=False, fg="yellow")
+                    click.secho(
+                        f"Invalid entry for '{identifier}' in '{self._path}' ({exc!r}). "
+                        "Skipping!",
+                        err=True,
+                    )
+                    continue
+                # The first entry for a package wins, just like in the file.
+                index.setdefault((str(identifier), package), (expires, entry))
+        return index
+
+    def should_ignore(
+        self, identifier: str, package_name: str, aliases: Iterable[str] = ()
+    ) -> Tuple[bool, Dict]:
+        """Returns True a given identifier or one of its aliases has an entry in the blacklist."""
+        if self._index is None:
+            self._index = self._compile()
+        if not self._index:
             return False, {}
 
-        for entry in self.entries.get(identifier, {}):
-            if entry["package"] in {package_name, canonicalize_name(package_name)}:
-                dt = datetime.datetime.strptime(
-                    f"{entry['expires']}", SkjoldIgnore.EXPIRES_FMT
-                )
-                return datetime.datetime.now(tz=dt.tzinfo) < dt, entry
+        package = canonicalize_name(package_name)
+        for candidate in (identifier, *aliases):
+            item = self._index.get((candidate, package))
+            if item is not None:
+                expires, entry = item
+                return datetime.datetime.now(tz=expires.tzinfo) < expires, entry
 
         return False, {}
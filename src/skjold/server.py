@@ -0,0 +1,299 @@
+"""Long-running audit server keeping sources loaded in memory and a thin client for it."""
+import copy
+import dataclasses
+import http.client
+import io
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from skjold.core import Dependency, DependencyList, SkjoldException
+from skjold.formats import extract_dependencies_from_files
+from skjold.ignore import SkjoldIgnore
+from skjold.tasks import (
+    Configuration,
+    SourceRegistry,
+    audit,
+    is_registered_source,
+    load_sources,
+)
+
+UNIX_PREFIX = "unix:"
+
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """Return a socket path for 'unix:PATH' or a (host, port) tuple for 'HOST:PORT'."""
+    if address.startswith(UNIX_PREFIX):
+        return address[len(UNIX_PREFIX) :]
+
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise SkjoldException(
+            f"Invalid address '{address}'! Expected HOST:PORT or unix:PATH."
+        )
+    return host, int(port)
+
+
+def _dependency_to_dict(dependency: Dependency) -> Dict[str, Any]:
+    return dataclasses.asdict(dependency)
+
+
+def _dependency_from_dict(item: Dict[str, Any]) -> Dependency:
+    path, lineno = item.get("source") or ("<unknown>", None)
+    return Dependency(
+        name=str(item["name"]), version=str(item["version"]), source=(path, lineno)
+    )
+
+
+class RefreshScheduler(threading.Thread):
+    """Refreshes outdated sources of a registry in the background every `interval` seconds."""
+
+    interval: float
+    registry: SourceRegistry
+    _stopped: threading.Event
+
+    def __init__(self, registry: SourceRegistry, interval: float) -> None:
+        super().__init__(name="skjold-refresh", daemon=True)
+        self.interval = interval
+        self.registry = registry
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.registry.refresh()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+class AuditServerMixin:
+    """State shared by the TCP and Unix socket flavours of the audit server."""
+
+    configuration: Configuration
+    registry: SourceRegistry
+    scheduler: Optional[RefreshScheduler] = None
+    # Sources held by the registry are not safe to use from several audits at once.
+    audit_lock: threading.Lock
+
+    def setup_audit(
+        self, configuration: Configuration, registry: SourceRegistry
+    ) -> None:
+        self.configuration = configuration
+        self.registry = registry
+        self.audit_lock = threading.Lock()
+
+    def start_refresh(self, interval: float) -> None:
+        """Refresh outdated sources in the background instead of while handling an audit."""
+        self.registry.background_refresh = True
+        self.scheduler = RefreshScheduler(self.registry, interval)
+        self.scheduler.start()
+
+    def stop_refresh(self) -> None:
+        if self.scheduler is not None:
+            self.scheduler.stop()
+            self.scheduler.join()
+            self.scheduler = None
+
+    def preload(self) -> None:
+        """Load all configured sources completely before accepting requests."""
+        with self.audit_lock:
+            load_sources(self.configuration, None, self.registry)
+
+    def handle_audit(self, request: Dict[str, Any]) -> List[Dict[str, Any]]:
+        configuration = copy.copy(self.configuration)
+
+        sources = request.get("sources") or self.configuration.sources
+        for name in sources:
+            if not is_registered_source(name):
+                raise SkjoldException(f"Source with name '{name}' does not exist!")
+        configuration.sources = list(sources)
+        # Clients decide whether findings are merged, e.g. ndjson output is never merged.
+        if request.get("deduplicate") is not None:
+            configuration.deduplicate = bool(request["deduplicate"])
+
+        if "files" in request:
+            files = []
+            for item in request["files"]:
+                file = io.StringIO(item["content"])
+                setattr(file, "name", item["name"])
+                files.append(file)
+            dependencies: DependencyList = list(
+                extract_dependencies_from_files(
+                    configuration, files, request.get("format")
+                )
+            )
+        else:
+            dependencies = [
+                _dependency_from_dict(item) for item in request.get("dependencies", [])
+            ]
+
+        ignore = SkjoldIgnore.using_document(
+            "<remote>", request.get("ignore") or {"version": "1.1", "ignore": {}}
+        )
+        with self.audit_lock:
+            return audit(configuration, dependencies, ignore, self.registry)
+
+    def handle_status(self) -> Dict[str, Any]:
+        return {
+            "sources": self.configuration.sources,
+            "loaded": self.registry.status(),
+            "refresh_interval": self.scheduler and self.scheduler.interval,
+        }
+
+
+class TCPAuditServer(AuditServerMixin, ThreadingHTTPServer):
+    daemon_threads = True
+
+    def server_close(self) -> None:
+        self.stop_refresh()
+        super().server_close()
+
+
+class UnixAuditServer(AuditServerMixin, socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def server_close(self) -> None:
+        self.stop_refresh()
+        super().server_close()
+
+
+AuditServer = Union[TCPAuditServer, UnixAuditServer]
+
+
+class AuditRequestHandler(BaseHTTPRequestHandler):
+    server: AuditServer
+
+    def _send(self, status: int, payload: Any) -> None:
+        body = json.dumps(payload, indent=2).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        # Unix sockets have no peer address.
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def do_GET(self) -> None:
+        if self.path != "/status":
+            self._send(404, {"error": f"Unknown path '{self.path}'."})
+            return
+        self._send(200, self.server.handle_status())
+
+    def do_POST(self) -> None:
+        if self.path != "/audit":
+            self._send(404, {"error": f"Unknown path '{self.path}'."})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            findings = self.server.handle_audit(request)
+        except (SkjoldException, ValueError, KeyError, TypeError) as exc:
+            self._send(400, {"error": str(exc)})
+            return
+        except Exception as exc:  # pragma: no cover
+            self._send(500, {"error": str(exc)})
+            return
+
+        self._send(200, findings)
+
+
+def create_server(
+    configuration: Configuration,
+    address: str,
+    registry: Optional[SourceRegistry] = None,
+) -> AuditServer:
+    """Return an audit server bound to 'address' (HOST:PORT or unix:PATH)."""
+    registry = registry or SourceRegistry()
+    server: AuditServer
+    target = parse_address(address)
+    if isinstance(target, str):
+        if os.path.exists(target):
+            # Only replace stale sockets, never files that happen to be at the given path.
+            if not stat.S_ISSOCK(os.stat(target).st_mode):
+                raise SkjoldException(f"'{target}' exists and is not a socket!")
+            os.unlink(target)
+        server = UnixAuditServer(target, AuditRequestHandler)
+    else:
+        server = TCPAuditServer(target, AuditRequestHandler)
+
+    server.setup_audit(configuration, registry)
+    return server
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self._path)
+        self.sock = sock
+
+
+def _request(
+    address: str, method: str, path: str, payload: Any = None, timeout: float = 300
+) -> Any:
+    target = parse_address(address)
+    connection: http.client.HTTPConnection
+    if isinstance(target, str):
+        connection = _UnixHTTPConnection(target, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(*target, timeout=timeout)
+
+    try:
+        body = None if payload is None else json.dumps(payload, default=str)
+        connection.request(
+            method, path, body=body, headers={"Content-Type": "application/json"}
+        )
+        response = connection.getresponse()
+        data = json.loads(response.read())
+    except (OSError, ValueError) as exc:
+        raise SkjoldException(f"Unable to reach skjold server at {address}: {exc}")
+    finally:
+        connection.close()
+
+    if response.status != 200:
+        raise SkjoldException(f"skjold server at {address}: {data.get('error')}")
+    return data
+
+
+def audit_remote(
+    address: str,
+    dependencies: DependencyList,
+    ignore: SkjoldIgnore,
+    sources: Optional[Sequence[str]] = None,
+    deduplicate: Optional[bool] = None,
+) -> List[Dict[str, Any]]:
+    """Audit dependencies using the skjold server at 'address' and return its findings.
+
+    Findings are merged according to 'deduplicate' or the server's configuration if it is None.
+    """
+    return list(
+        _request(
+            address,
+            "POST",
+            "/audit",
+            {
+                "dependencies": [_dependency_to_dict(item) for item in dependencies],
+                "ignore": ignore.document,
+                "sources": list(sources or []),
+                "deduplicate": deduplicate,
+            },
+        )
+    )
+
+
+def server_status(address: str) -> Dict[str, Any]:
+    """Return the status reported by the skjold server at 'address'."""
+    return dict(_request(address, "GET", "/status"))
@@ -1,7 +1,19 @@
-from .gemnasium import Gemnasium
-from .github import Github
-from .osv import OSV
-from .pypa import PyPAAdvisoryDB
-from .pyup import PyUp
+"""Built-in advisory sources. Submodules are only imported once one of their sources is used."""
+import importlib
+from typing import Any
+
+_SOURCE_MODULES = {
+    "Gemnasium": "gemnasium",
+    "Github": "github",
+    "OSV": "osv",
+    "PyPAAdvisoryDB": "pypa",
+    "PyUp": "pyup",
+}
 
 __all__ = ("Github", "PyUp", "Gemnasium", "OSV", "PyPAAdvisoryDB")
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _SOURCE_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{_SOURCE_MODULES[name]}", __name__), name)
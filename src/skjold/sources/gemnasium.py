@@ -1,33 +1,41 @@
 import os
-import tarfile
-import urllib.request
 from collections import defaultdict
-from typing import Callable, List, Tuple
+from typing import Callable, List, Optional, Tuple
 
-import yaml
 from packaging import specifiers
 from packaging.utils import NormalizedName, canonicalize_name
-from packaging.version import Version
 
+from skjold.archive import iter_yaml_members
 from skjold.core import (
     Dependency,
     SecurityAdvisory,
     SecurityAdvisorySource,
-    SkjoldException,
+    parse_version,
 )
 from skjold.cvss import parse_cvss
+from skjold.download import download, verify_gzip
 from skjold.tasks import register_source
 
 
 class GemnasiumSecurityAdvisory(SecurityAdvisory):
     _json: dict
+    _severity: str
+    _vulnerable_version_range: Optional[List[specifiers.SpecifierSet]] = None
 
     @classmethod
     def using(cls, json_: dict) -> "GemnasiumSecurityAdvisory":
         obj = cls()
         obj._json = json_
+        obj._severity = _severity_from_cvss(json_)
         return obj
 
+    def to_json(self) -> dict:
+        return self._json
+
+    @classmethod
+    def from_json(cls, json_: dict) -> "GemnasiumSecurityAdvisory":
+        return cls.using(json_)
+
     @property
     def identifier(self) -> str:
         return str(self._json["identifier"])
@@ -37,14 +45,16 @@ class GemnasiumSecurityAdvisory(SecurityAdvisory):
         return "gemnasium"
 
     @property
-    def severity(self) -> str:
-        for field in ["cvss_v3", "cvss_v2"]:
-            vector = self._json.get(field, None)
-            if vector:
-                cvss = parse_cvss(vector)
-                return cvss.severity
+    def aliases(self) -> List[str]:
+        return [
+            str(item)
+            for item in self._json.get("identifiers") or []
+            if item != self._json["identifier"]
+        ]
 
-        return "UNKNOWN"
+    @property
+    def severity(self) -> str:
+        return self._severity
 
     @property
     def url(self) -> str:
@@ -68,6 +78,11 @@ class GemnasiumSecurityAdvisory(SecurityAdvisory):
 
     @property
     def vulnerable_version_range(self) -> List[specifiers.SpecifierSet]:
+        if self._vulnerable_version_range is None:
+            self._vulnerable_version_range = self._compile_vulnerable_version_range()
+        return self._vulnerable_version_range
+
+    def _compile_vulnerable_version_range(self) -> List[specifiers.SpecifierSet]:
         affected_range = self._json["affected_range"]
 
         # Gemnasium sometimes uses spaces instead of commas for ranges
@@ -96,8 +111,12 @@ class GemnasiumSecurityAdvisory(SecurityAdvisory):
     def vulnerable_versions(self) -> str:
         return ",".join([str(x) for x in self.vulnerable_version_range])
 
+    @property
+    def affected_specifiers(self) -> List[specifiers.SpecifierSet]:
+        return self.vulnerable_version_range
+
     def is_affected(self, version: str) -> bool:
-        version_ = Version(version)
+        version_ = parse_version(version)
         allows_: Callable[[specifiers.SpecifierSet], bool] = (
             lambda x: True if version_ in x else False
         )
@@ -105,7 +124,28 @@ class GemnasiumSecurityAdvisory(SecurityAdvisory):
         return any(affected_versions)
 
 
+def _severity_from_cvss(json_: dict) -> str:
+    """Return the severity of the most recent CVSS vector of an advisory."""
+    for field in ["cvss_v3", "cvss_v2"]:
+        vector = json_.get(field, None)
+        if vector:
+            try:
+                return parse_cvss(vector).severity
+            except (KeyError, IndexError):
+                # Malformed vectors must not prevent the advisory from being loaded.
+                continue
+
+    return "UNKNOWN"
+
+
+def _package_from_member_name(name: str) -> str:
+    """Return the package slug from a member path like '<root>/pypi/<slug>/<id>.yml'."""
+    return name.split("/pypi/", 1)[1].split("/", 1)[0]
+
+
 class Gemnasium(SecurityAdvisorySource):
+    advisory_type = GemnasiumSecurityAdvisory
+    supports_partial_loading = True
     _url = "https://gitlab.com/gitlab-org/security-products/gemnasium-db/-/archive/master/gemnasium-db-master.tar.gz"
     _name = "gemnasium"
 
@@ -119,36 +159,32 @@ class Gemnasium(SecurityAdvisorySource):
 
     def populate_from_cache(self) -> None:
         self._advisories = defaultdict(list)
-        with tarfile.TarFile.open(self.path, mode="r:gz") as archive:
-            pypi_advisories = filter(
-                lambda obj: "/pypi/" in obj.name and obj.name.endswith(".yml"),
-                archive.getmembers(),
-            )
-
-            for obj in list(pypi_advisories):
-                obj_fh = archive.extractfile(obj.name)
-                if obj_fh:
-                    doc = yaml.load(obj_fh, Loader=yaml.SafeLoader)
-                    advisory = GemnasiumSecurityAdvisory.using(doc)
-                    self._advisories[advisory.canonical_name].append(advisory)
-                else:  # pragma: no cover
-                    raise SkjoldException(
-                        f"Unable to extract '{obj.name}' from source archive."
-                    )
+        pypi_advisories = iter_yaml_members(
+            self.path,
+            lambda name: "/pypi/" in name
+            and name.endswith(".yml")
+            and self.is_wanted(_package_from_member_name(name)),
+            max_workers=self._jobs,
+        )
+
+        for _, doc in pypi_advisories:
+            advisory = GemnasiumSecurityAdvisory.using(doc)
+            self._advisories[advisory.canonical_name].append(advisory)
 
     @property
     def total_count(self) -> int:
         return len(self._advisories.keys())
 
     def update(self) -> None:
-        request = urllib.request.Request(
-            url=self._url, headers={"User-Agent": "Mozilla/5.0"}
+        download(
+            self._url,
+            self.path,
+            headers={"User-Agent": "Mozilla/5.0"},
+            verify=verify_gzip,
         )
-        with urllib.request.urlopen(request) as response:
-            with open(self.path, "wb") as fh:
-                fh.write(response.read())
 
     def has_security_advisory_for(self, dependency: Dependency) -> bool:
+        self.require({dependency.canonical_name})
         return dependency.canonical_name in self.advisories.keys()
 
     def is_vulnerable_package(
@@ -157,11 +193,7 @@ class Gemnasium(SecurityAdvisorySource):
         if not self.has_security_advisory_for(dependency):
             return False, []
 
-        advisories = []
-        for candidate in self.advisories[dependency.canonical_name]:
-            if candidate.is_affected(dependency.version):
-                advisories.append(candidate)
-
+        advisories = self.find_affecting(dependency)
         return len(advisories) > 0, advisories
 
 
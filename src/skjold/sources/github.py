@@ -7,14 +7,21 @@ from typing import Any, Dict, Iterator, List, Optional, Tuple
 import click
 from packaging import specifiers
 from packaging.utils import NormalizedName, canonicalize_name
-from packaging.version import Version
 
-from skjold.core import Dependency, SecurityAdvisory, SecurityAdvisorySource
+from skjold import timings
+from skjold.cache import atomic_write
+from skjold.core import (
+    Dependency,
+    SecurityAdvisory,
+    SecurityAdvisorySource,
+    parse_version,
+)
 from skjold.tasks import register_source
 
 
 class GithubSecurityAdvisory(SecurityAdvisory):
     _json: Dict
+    _vulnerable_version_range: Optional[specifiers.SpecifierSet] = None
 
     @classmethod
     def using(cls, json_: dict) -> "GithubSecurityAdvisory":
@@ -22,6 +29,13 @@ class GithubSecurityAdvisory(SecurityAdvisory):
         obj._json = json_
         return obj
 
+    def to_json(self) -> dict:
+        return self._json
+
+    @classmethod
+    def from_json(cls, json_: dict) -> "GithubSecurityAdvisory":
+        return cls.using(json_)
+
     @property
     def identifier(self) -> str:
         return str(self.__advisory["ghsaId"])
@@ -30,6 +44,14 @@ class GithubSecurityAdvisory(SecurityAdvisory):
     def source(self) -> str:
         return "github"
 
+    @property
+    def aliases(self) -> List[str]:
+        return [
+            str(item["value"])
+            for item in self.__advisory.get("identifiers") or []
+            if item["value"] != self.identifier
+        ]
+
     @property
     def references(self) -> List[str]:
         return [reference["url"] for reference in self.__advisory["references"]]
@@ -64,6 +86,11 @@ class GithubSecurityAdvisory(SecurityAdvisory):
 
     @property
     def vulnerable_version_range(self) -> specifiers.SpecifierSet:
+        if self._vulnerable_version_range is None:
+            self._vulnerable_version_range = self._compile_vulnerable_version_range()
+        return self._vulnerable_version_range
+
+    def _compile_vulnerable_version_range(self) -> specifiers.SpecifierSet:
         items = self._json["node"]["vulnerableVersionRange"].split(",")
         if len(items) > 2:
             raise ValueError(f"Found more than 2 version specifiers!")
@@ -82,8 +109,12 @@ class GithubSecurityAdvisory(SecurityAdvisory):
     def vulnerable_versions(self) -> str:
         return str(self.vulnerable_version_range)
 
+    @property
+    def affected_specifiers(self) -> List[specifiers.SpecifierSet]:
+        return [self.vulnerable_version_range]
+
     def is_affected(self, version: str) -> bool:
-        version_ = Version(version)
+        version_ = parse_version(version)
         return version_ in self.vulnerable_version_range
 
     @property
@@ -120,6 +151,10 @@ def _query_github_graphql(
                 node {{
                     advisory {{
                         ghsaId
+                        identifiers {{
+                            type
+                            value
+                        }}
                         publishedAt
                         references {{
                             url
@@ -151,6 +186,7 @@ def _query_github_graphql(
             "Content-Type": "application/json; charset=utf-8",
         },
     )
+    timings.count("http requests")
     with urllib.request.urlopen(request_) as response:
         _data = json.loads(response.read())
 
@@ -163,17 +199,42 @@ def _query_github_graphql(
 
 
 def _fetch_github_security_advisories(
-    limit: int = 100,
-) -> Iterator[Tuple[int, str, bool, dict]]:
-    total_count, cursor, has_next, data = _query_github_graphql(limit, None)
-    yield from data
+    limit: int = 100, since: Optional[str] = None
+) -> Iterator[dict]:
+    """Yield security vulnerabilities ordered by `updatedAt` (newest first).
+
+    If `since` is given, stop paging once vulnerabilities updated before `since` are reached.
+    """
+    cursor, has_next = None, True
 
     while has_next:
         total_count, cursor, has_next, data = _query_github_graphql(limit, cursor)
-        yield from data
+        for item in data:
+            if since is not None and item["node"]["updatedAt"] < since:
+                return
+            yield item
+
+
+def _merge_github_security_advisories(
+    known: List[dict], fetched: List[dict]
+) -> List[dict]:
+    """Return `fetched` followed by every known vulnerability that hasn't been superseded by it.
+
+    Vulnerabilities are identified by advisory and package. An advisory may list several ranges for
+    the same package and ranges may be corrected, so all known ranges of a fetched advisory and
+    package are replaced by the fetched ones.
+    """
+
+    def key(item: dict) -> Tuple[str, str]:
+        node = item["node"]
+        return node["advisory"]["ghsaId"], node["package"]["name"]
+
+    replaced = {key(item) for item in fetched}
+    return fetched + [item for item in known if key(item) not in replaced]
 
 
 class Github(SecurityAdvisorySource):
+    advisory_type = GithubSecurityAdvisory
     _name = "github"
 
     @property
@@ -197,8 +258,31 @@ class Github(SecurityAdvisorySource):
         return os.path.join(self._cache_dir, "github.cache")
 
     def update(self) -> None:
-        data = list(_fetch_github_security_advisories())
-        with open(self.path, "w") as fh:
+        known: List[dict] = []
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "rb") as fh:
+                    known = json.load(fh)
+            except ValueError:
+                known = []
+
+        # Caches written before identifiers were queried lack them; fetch everything again.
+        if any("identifiers" not in item["node"]["advisory"] for item in known):
+            known = []
+
+        # Only fetch vulnerabilities updated since the newest one we already know about. The newest
+        # ones are fetched again as others may share their timestamp. They are kept when merging as
+        # they may share advisory and package with changed ones.
+        since = max((item["node"]["updatedAt"] for item in known), default=None)
+        fetched = list(_fetch_github_security_advisories(since=since))
+        if known and all(
+            item["node"]["updatedAt"] == since and item in known for item in fetched
+        ):
+            os.utime(self.path)
+            return
+
+        data = _merge_github_security_advisories(known, fetched)
+        with atomic_write(self.path, "w") as fh:
             json.dump(data, fh)
 
     def has_security_advisory_for(self, dependency: Dependency) -> bool:
@@ -207,11 +291,7 @@ class Github(SecurityAdvisorySource):
     def is_vulnerable_package(
         self, dependency: Dependency
     ) -> Tuple[bool, List[SecurityAdvisory]]:
-        advisories = []
-        for candidate in self.advisories[dependency.canonical_name]:
-            if candidate.is_affected(dependency.version):
-                advisories.append(candidate)
-
+        advisories = self.find_affecting(dependency)
         return len(advisories) > 0, advisories
 
 
@@ -1,51 +1,110 @@
 import json
 import os
+import time
+import urllib.parse
 import urllib.request
-from typing import Any, Callable, List, MutableMapping, Optional, Sequence, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from packaging import specifiers
 from packaging.utils import NormalizedName, canonicalize_name
-from packaging.version import Version
 
+from skjold import timings
+from skjold.cache import atomic_write
 from skjold.core import (
     Dependency,
+    DependencyList,
     SecurityAdvisory,
     SecurityAdvisoryList,
     SecurityAdvisorySource,
+    parse_version,
 )
+from skjold.store import AdvisoryStore
 from skjold.tasks import register_source
 
+_OSV_API_URL = "https://api.osv.dev"
+# Maximum number of queries the OSV.dev API accepts in a single querybatch request.
+_OSV_QUERYBATCH_LIMIT = 1000
 
-def _osv_dev_api_request(
-    package_name: NormalizedName, package_version: str, ecosystem: str = "PyPI"
-) -> Any:
-    """Return list of vulnerabilities for a given `package_name` and `package_version` via OSV.dev API."""
-
-    _api_token = os.environ.get("SKJOLD_OSV_API_TOKEN", None)
 
-    payload = json.dumps(
-        {
-            "version": package_version,
-            "package": {"name": package_name, "ecosystem": ecosystem},
-        }
-    ).encode("utf-8")
+def _osv_dev_api_call(
+    path: str, payload: Any = None, api_url: str = _OSV_API_URL
+) -> Any:
+    """Send a request to the given OSV.dev API endpoint and return the decoded JSON response."""
     request_ = urllib.request.Request(
-        url="https://api.osv.dev/v1/query",
-        data=payload,
+        url=f"{api_url}{path}",
+        data=None if payload is None else json.dumps(payload).encode("utf-8"),
         headers={
             "Accept": "application/json",
-            # "Authorization": f"Bearer {_api_token}",
             "Content-Type": "application/json; charset=utf-8",
         },
     )
+    timings.count("http requests")
     with urllib.request.urlopen(request_) as response:
-        _data = json.loads(response.read())
+        return json.loads(response.read())
+
+
+def _osv_dev_api_querybatch(
+    packages: Sequence[Tuple[NormalizedName, str]],
+    ecosystem: str = "PyPI",
+    api_url: str = _OSV_API_URL,
+    limit: int = _OSV_QUERYBATCH_LIMIT,
+) -> List[List[str]]:
+    """Return vulnerability ids for each (`package_name`, `package_version`) via OSV.dev querybatch API."""
+    results: List[List[str]] = [[] for _ in packages]
+
+    # Pending entries are (position, page_token) and are sent in chunks of at most `limit` queries.
+    pending: List[Tuple[int, Optional[str]]] = [
+        (idx, None) for idx in range(len(packages))
+    ]
+    while pending:
+        chunk, pending = pending[:limit], pending[limit:]
+        queries = []
+        for idx, page_token in chunk:
+            package_name, package_version = packages[idx]
+            query: Dict[str, Any] = {
+                "version": package_version,
+                "package": {"name": package_name, "ecosystem": ecosystem},
+            }
+            if page_token:
+                query["page_token"] = page_token
+            queries.append(query)
+
+        _data = _osv_dev_api_call(
+            "/v1/querybatch", {"queries": queries}, api_url=api_url
+        )
+        for (idx, _), result in zip(chunk, _data.get("results", [])):
+            results[idx].extend(vuln["id"] for vuln in result.get("vulns", []))
+            if result.get("next_page_token"):
+                pending.append((idx, result["next_page_token"]))
+
+    return results
+
+
+def _osv_dev_api_vulnerability(vuln_id: str, api_url: str = _OSV_API_URL) -> Any:
+    """Return the full OSV document for the given vulnerability id via OSV.dev API."""
+    return _osv_dev_api_call(
+        f"/v1/vulns/{urllib.parse.quote(vuln_id)}", api_url=api_url
+    )
+
 
-    return _data.get("vulns", [])
+def _cache_key(package_name: NormalizedName, package_version: str) -> str:
+    return f"{package_name}=={package_version}"
 
 
 class OSVSecurityAdvisory(SecurityAdvisory):
     _json: dict
+    _vulnerable_version_range: Optional[List[specifiers.SpecifierSet]] = None
 
     @classmethod
     def using(cls, osv1_doc: dict) -> List["OSVSecurityAdvisory"]:
@@ -66,6 +125,16 @@ class OSVSecurityAdvisory(SecurityAdvisory):
             advisories.append(obj)
         return advisories
 
+    def to_json(self) -> dict:
+        return self._json
+
+    @classmethod
+    def from_json(cls, json_: dict) -> "OSVSecurityAdvisory":
+        # `using` flattens documents into one advisory per affected package; these are stored as is.
+        obj = cls()
+        obj._json = json_
+        return obj
+
     @property
     def identifier(self) -> str:
         return str(self._json["id"])
@@ -78,6 +147,10 @@ class OSVSecurityAdvisory(SecurityAdvisory):
     def severity(self) -> str:
         return "UNKNOWN"
 
+    @property
+    def aliases(self) -> List[str]:
+        return [str(alias) for alias in self._json.get("aliases", [])]
+
     @property
     def url(self) -> str:
         return str(self.references[0])
@@ -100,18 +173,24 @@ class OSVSecurityAdvisory(SecurityAdvisory):
 
     @property
     def vulnerable_version_range(self) -> List[specifiers.SpecifierSet]:
-        affected_versions = self._json.get("affected_versions", [])
-        return [
-            specifiers.SpecifierSet(f"=={x}", prereleases=True)
-            for x in affected_versions
-        ]
+        if self._vulnerable_version_range is None:
+            affected_versions = self._json.get("affected_versions", [])
+            self._vulnerable_version_range = [
+                specifiers.SpecifierSet(f"=={x}", prereleases=True)
+                for x in affected_versions
+            ]
+        return self._vulnerable_version_range
 
     @property
     def vulnerable_versions(self) -> str:
         return "||".join([str(x) for x in self.vulnerable_version_range])
 
+    @property
+    def affected_specifiers(self) -> List[specifiers.SpecifierSet]:
+        return self.vulnerable_version_range
+
     def is_affected(self, version: str) -> bool:
-        version_ = Version(version)
+        version_ = parse_version(version)
         allows_: Callable[[specifiers.SpecifierSet], bool] = (
             lambda x: True if version_ in x else False
         )
@@ -120,46 +199,171 @@ class OSVSecurityAdvisory(SecurityAdvisory):
 
 
 class OSV(SecurityAdvisorySource):
-
+    _api_url: str = _OSV_API_URL
+    _batch_size: int = _OSV_QUERYBATCH_LIMIT
+    _documents: Dict[str, Dict[str, Any]]
     _name = "osv"
+    _queries: Dict[str, Dict[str, Any]]
+    _results: Dict[Tuple[NormalizedName, str], List[SecurityAdvisory]]
+    _workers: int = 8
+
+    def __init__(
+        self,
+        cache_dir: str,
+        cache_expires: int = 0,
+        packages: Optional[AbstractSet[NormalizedName]] = None,
+        store: Optional[AdvisoryStore] = None,
+        jobs: int = 1,
+    ) -> None:
+        super().__init__(cache_dir, cache_expires, packages, store, jobs)
+        self._documents, self._queries, self._results = {}, {}, {}
 
     @property
     def name(self) -> str:
         return self._name
 
     @property
-    def path(self) -> Optional[str]:
+    def path(self) -> str:
+        return os.path.join(self._cache_dir, "osv.cache")
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        # Responses are cached per (package, version) and are used as is.
         return None
 
     def populate_from_cache(self) -> None:
-        pass
+        self._queries, self._documents = {}, {}
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, "rb") as fh:
+                cache_ = json.load(fh)
+        except ValueError:
+            return
+
+        self._queries = cache_.get("queries", {})
+        self._documents = cache_.get("vulnerabilities", {})
+
+    def _is_fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        """Return True if the given cache entry is younger than `cache_expires`. False otherwise."""
+        if entry is None:
+            return False
+        return int(time.time()) - int(entry["fetched_at"]) < self._cache_expires
+
+    def _save_cache(self) -> None:
+        """Persist all cache entries that have not expired yet."""
+        with atomic_write(self.path, "w") as fh:
+            json.dump(
+                {
+                    "queries": {
+                        key: entry
+                        for key, entry in self._queries.items()
+                        if self._is_fresh(entry)
+                    },
+                    "vulnerabilities": {
+                        key: entry
+                        for key, entry in self._documents.items()
+                        if self._is_fresh(entry)
+                    },
+                },
+                fh,
+            )
 
     @property
     def total_count(self) -> int:
         return 0
 
+    @property
+    def loaded_count(self) -> int:
+        return len(self._documents)
+
     def update(self) -> None:
         pass
 
+    def _fetch(self, dependencies: DependencyList) -> None:
+        """Resolve all dependencies not seen before from the local cache or via OSV.dev.
+
+        Results are cached per (package, version) including packages without any vulnerabilities.
+        Anything missing or expired is requested using as few requests as possible.
+        """
+        keys = list(
+            dict.fromkeys(
+                (dependency.canonical_name, dependency.version)
+                for dependency in dependencies
+                if (dependency.canonical_name, dependency.version) not in self._results
+            )
+        )
+
+        if not keys:
+            return
+
+        self.prepare()
+        now = int(time.time())
+
+        stale = [
+            key
+            for key in keys
+            if not self._is_fresh(self._queries.get(_cache_key(*key)))
+        ]
+        if stale:
+            vuln_ids = _osv_dev_api_querybatch(
+                stale, api_url=self._api_url, limit=self._batch_size
+            )
+            for key, ids in zip(stale, vuln_ids):
+                self._queries[_cache_key(*key)] = {"fetched_at": now, "ids": ids}
+
+        # Fetch every referenced vulnerability that isn't cached exactly once.
+        missing = sorted(
+            {
+                vuln_id
+                for key in keys
+                for vuln_id in self._queries[_cache_key(*key)]["ids"]
+                if not self._is_fresh(self._documents.get(vuln_id))
+            }
+        )
+        with ThreadPoolExecutor(max_workers=self._workers) as executor:
+            documents = executor.map(
+                lambda vuln_id: _osv_dev_api_vulnerability(
+                    vuln_id, api_url=self._api_url
+                ),
+                missing,
+            )
+            for vuln_id, document in zip(missing, documents):
+                self._documents[vuln_id] = {"fetched_at": now, "document": document}
+
+        if stale or missing:
+            try:
+                self._save_cache()
+            except OSError:  # pragma: no cover
+                pass
+
+        for key in keys:
+            advisories: List[SecurityAdvisory] = []
+            for vuln_id in self._queries[_cache_key(*key)]["ids"]:
+                candidates = OSVSecurityAdvisory.using(
+                    self._documents[vuln_id]["document"]
+                )
+                matching = [c for c in candidates if c.canonical_name == key[0]]
+                advisories.extend(matching or candidates)
+            self._results[key] = advisories
+
+    def match_many(
+        self, dependencies: DependencyList
+    ) -> List[Tuple[Dependency, Sequence[SecurityAdvisory]]]:
+        self._fetch(dependencies)
+        return super().match_many(dependencies)
+
     def has_security_advisory_for(self, dependency: Dependency) -> bool:
-        """Always return `True` since to ensure we always call the OSV API for every package."""
-        return True
+        self._fetch([dependency])
+        return len(self._results[(dependency.canonical_name, dependency.version)]) > 0
 
     def is_vulnerable_package(
         self, dependency: Dependency
     ) -> Tuple[bool, Sequence[SecurityAdvisory]]:
-
-        findings = _osv_dev_api_request(dependency.canonical_name, dependency.version)
-        if not len(findings):
-            return False, []
-
-        advisories = []
-        for finding in findings:
-            results = OSVSecurityAdvisory.using(finding)
-            for advisory in results:
-                advisories.append(advisory)
-
-        return True, advisories
+        self._fetch([dependency])
+        advisories = self._results[(dependency.canonical_name, dependency.version)]
+        return len(advisories) > 0, advisories
 
     def get_security_advisories(
         self,
@@ -1,22 +1,22 @@
 import os
-import tarfile
-import urllib.request
 from collections import defaultdict
 from typing import List, Tuple
 
-import yaml
-
-from skjold.core import (
-    Dependency,
-    SecurityAdvisory,
-    SecurityAdvisorySource,
-    SkjoldException,
-)
+from skjold.archive import iter_yaml_members
+from skjold.core import Dependency, SecurityAdvisory, SecurityAdvisorySource
+from skjold.download import download, verify_gzip
 from skjold.sources.osv import OSVSecurityAdvisory
 from skjold.tasks import register_source
 
 
+def _package_from_member_name(name: str) -> str:
+    """Return the package name from a member path like '<root>/vulns/<package>/<id>.yaml'."""
+    return name.split("/vulns/", 1)[1].split("/", 1)[0]
+
+
 class PyPAAdvisoryDB(SecurityAdvisorySource):
+    advisory_type = OSVSecurityAdvisory
+    supports_partial_loading = True
 
     _url = "https://api.github.com/repos/pypa/advisory-db/tarball"
     _name = "pypa"
@@ -31,37 +31,33 @@ class PyPAAdvisoryDB(SecurityAdvisorySource):
 
     def populate_from_cache(self) -> None:
         self._advisories = defaultdict(list)
-        with tarfile.TarFile.open(self.path, mode="r:gz") as archive:
-            pypi_advisories = filter(
-                lambda obj: "/vulns/" in obj.name and obj.name.endswith(".yaml"),
-                archive.getmembers(),
-            )
-
-            for obj in list(pypi_advisories):
-                obj_fh = archive.extractfile(obj.name)
-                if obj_fh:
-                    doc = yaml.load(obj_fh, Loader=yaml.SafeLoader)
-                    advisories = OSVSecurityAdvisory.using(doc)
-                    for advisory in advisories:
-                        self._advisories[advisory.canonical_name].append(advisory)
-                else:  # pragma: no cover
-                    raise SkjoldException(
-                        f"Unable to extract '{obj.name}' from source archive."
-                    )
+        pypi_advisories = iter_yaml_members(
+            self.path,
+            lambda name: "/vulns/" in name
+            and name.endswith(".yaml")
+            and self.is_wanted(_package_from_member_name(name)),
+            max_workers=self._jobs,
+        )
+
+        for _, doc in pypi_advisories:
+            advisories = OSVSecurityAdvisory.using(doc)
+            for advisory in advisories:
+                self._advisories[advisory.canonical_name].append(advisory)
 
     @property
     def total_count(self) -> int:
         return len(self._advisories.keys())
 
     def update(self) -> None:
-        request = urllib.request.Request(
-            url=self._url, headers={"User-Agent": "Mozilla/5.0"}
+        download(
+            self._url,
+            self.path,
+            headers={"User-Agent": "Mozilla/5.0"},
+            verify=verify_gzip,
         )
-        with urllib.request.urlopen(request) as response:
-            with open(self.path, "wb") as fh:
-                fh.write(response.read())
 
     def has_security_advisory_for(self, dependency: Dependency) -> bool:
+        self.require({dependency.canonical_name})
         return dependency.canonical_name in self.advisories.keys()
 
     def is_vulnerable_package(
@@ -70,11 +66,7 @@ class PyPAAdvisoryDB(SecurityAdvisorySource):
         if not self.has_security_advisory_for(dependency):
             return False, []
 
-        advisories = []
-        for candidate in self.advisories[dependency.canonical_name]:
-            if candidate.is_affected(dependency.version):
-                advisories.append(candidate)
-
+        advisories = self.find_affecting(dependency)
         return len(advisories) > 0, advisories
 
 
@@ -1,20 +1,35 @@
 import datetime
 import json
 import os
-import urllib.request
 from collections import defaultdict
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from packaging import specifiers
 from packaging.utils import NormalizedName, canonicalize_name
-from packaging.version import Version
 
-from skjold.core import Dependency, SecurityAdvisory, SecurityAdvisorySource
+from skjold.core import (
+    Dependency,
+    SecurityAdvisory,
+    SecurityAdvisorySource,
+    parse_version,
+)
+from skjold.download import download, verify_json
+from skjold.store import AdvisoryStore
 from skjold.tasks import register_source
 
 
 class PyUpSecurityAdvisory(SecurityAdvisory):
     _json: Dict[str, str]
+    _vulnerable_version_range: Optional[List[specifiers.SpecifierSet]] = None
 
     @classmethod
     def using(cls, name: str, json_: dict) -> "PyUpSecurityAdvisory":
@@ -23,6 +38,13 @@ class PyUpSecurityAdvisory(SecurityAdvisory):
         obj._json["name"] = name
         return obj
 
+    def to_json(self) -> dict:
+        return self._json
+
+    @classmethod
+    def from_json(cls, json_: dict) -> "PyUpSecurityAdvisory":
+        return cls.using(json_["name"], json_)
+
     @property
     def identifier(self) -> str:
         return self._json["cve"]
@@ -31,6 +53,11 @@ class PyUpSecurityAdvisory(SecurityAdvisory):
     def source(self) -> str:
         return "pyup"
 
+    @property
+    def aliases(self) -> List[str]:
+        identifier = self._json.get("id")
+        return [identifier] if identifier and identifier != self.identifier else []
+
     @property
     def severity(self) -> str:
         return "UNKNOWN"
@@ -60,16 +87,23 @@ class PyUpSecurityAdvisory(SecurityAdvisory):
 
     @property
     def vulnerable_version_range(self) -> List[specifiers.SpecifierSet]:
-        return [
-            specifiers.SpecifierSet(v, prereleases=True) for v in self._json["specs"]
-        ]
+        if self._vulnerable_version_range is None:
+            self._vulnerable_version_range = [
+                specifiers.SpecifierSet(v, prereleases=True)
+                for v in self._json["specs"]
+            ]
+        return self._vulnerable_version_range
 
     @property
     def vulnerable_versions(self) -> str:
         return ",".join([str(x) for x in self.vulnerable_version_range])
 
+    @property
+    def affected_specifiers(self) -> List[specifiers.SpecifierSet]:
+        return self.vulnerable_version_range
+
     def is_affected(self, version: str) -> bool:
-        version_ = Version(version)
+        version_ = parse_version(version)
         allows_: Callable[[specifiers.SpecifierSet], bool] = (
             lambda x: True if version_ in x else False
         )
@@ -79,10 +113,21 @@ class PyUpSecurityAdvisory(SecurityAdvisory):
 
 
 class PyUp(SecurityAdvisorySource):
-
+    advisory_type = PyUpSecurityAdvisory
     _url: str = "https://raw.githubusercontent.com/pyupio/safety-db/master/data/insecure_full.json"
     _name: str = "pyup"
-    _metadata: Dict[str, Union[str, int]] = {}
+    _metadata: Dict[str, Union[str, int]]
+
+    def __init__(
+        self,
+        cache_dir: str,
+        cache_expires: int = 0,
+        packages: Optional[AbstractSet[NormalizedName]] = None,
+        store: Optional[AdvisoryStore] = None,
+        jobs: int = 1,
+    ) -> None:
+        super().__init__(cache_dir, cache_expires, packages, store, jobs)
+        self._metadata = {}
 
     @property
     def name(self) -> str:
@@ -119,16 +164,19 @@ class PyUp(SecurityAdvisorySource):
                 obj = PyUpSecurityAdvisory.using(package_name, advisory)
                 self._advisories[obj.canonical_name].append(obj)
 
+    def to_snapshot(self) -> Any:
+        return self._metadata
+
+    def from_snapshot(self, state: Any) -> None:
+        self._metadata = state
+
     def update(self) -> None:
-        request_ = urllib.request.Request(
-            url=self._url,
+        download(
+            self._url,
+            self.path,
             headers={"Accept": "application/json"},
+            verify=verify_json,
         )
-        with urllib.request.urlopen(request_) as response:
-            json_ = json.loads(response.read())
-
-        with open(self.path, "w") as fh:
-            json.dump(json_, fh)
 
     def has_security_advisory_for(self, dependency: Dependency) -> bool:
         return dependency.canonical_name in self.advisories.keys()
@@ -136,11 +184,7 @@ class PyUp(SecurityAdvisorySource):
     def is_vulnerable_package(
         self, dependency: Dependency
     ) -> Tuple[bool, List[SecurityAdvisory]]:
-        advisories = []
-        for candidate in self.advisories[dependency.canonical_name]:
-            if candidate.is_affected(dependency.version):
-                advisories.append(candidate)
-
+        advisories = self.find_affecting(dependency)
         return len(advisories) > 0, advisories
 
 
@@ -0,0 +1,226 @@
+"""Optional SQLite storage for advisories shared by all sources."""
+import json
+import sqlite3
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+)
+
+from packaging.utils import NormalizedName
+
+from skjold.cache import SNAPSHOT_VERSION, Fingerprint
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    state TEXT
+);
+CREATE TABLE IF NOT EXISTS advisories (
+    source TEXT NOT NULL,
+    canonical_name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    identifier TEXT NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS advisories_by_package
+    ON advisories (source, canonical_name, position);
+"""
+
+# Advisories are rebuilt from the plain data returned by `SecurityAdvisory.to_json`.
+AdvisoryFactory = Callable[[Dict[str, Any]], Any]
+
+
+class AdvisoryStore:
+    """Advisories of all sources kept in a single SQLite database indexed by canonical package name.
+
+    Each source's advisories are stored along with the fingerprint of the raw cache they were built
+    from and are only rebuilt once it changes. Advisories and state are stored as JSON.
+    """
+
+    _connection: sqlite3.Connection
+    _lock: threading.Lock
+    path: str
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        # Sources are loaded on worker threads but queried from the main thread.
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            (version,) = self._connection.execute("PRAGMA user_version").fetchone()
+            if version != SNAPSHOT_VERSION:
+                # Databases written by other versions are rebuilt from scratch.
+                self._connection.executescript(
+                    "DROP TABLE IF EXISTS advisories; DROP TABLE IF EXISTS sources;"
+                )
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version = {SNAPSHOT_VERSION}")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _query(self, sql: str, *parameters: Any) -> List[Any]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def is_current(self, source: str, fingerprint_: Fingerprint) -> bool:
+        """Return True if advisories for 'source' were built from a raw cache matching 'fingerprint_'."""
+        rows = self._query(
+            "SELECT version, size, sha256 FROM sources WHERE name = ?", source
+        )
+        return bool(rows) and tuple(rows[0]) == (SNAPSHOT_VERSION, *fingerprint_)
+
+    def replace(
+        self,
+        source: str,
+        fingerprint_: Fingerprint,
+        advisories: Mapping[NormalizedName, List[Any]],
+        state: Any = None,
+    ) -> None:
+        """Replace all advisories stored for 'source' in a single transaction."""
+        rows = (
+            (
+                source,
+                name,
+                position,
+                advisory.identifier,
+                _dumps(advisory.to_json()),
+            )
+            for name, items in advisories.items()
+            for position, advisory in enumerate(items)
+        )
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM advisories WHERE source = ?", (source,)
+            )
+            self._connection.executemany(
+                "INSERT INTO advisories VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)",
+                (
+                    source,
+                    SNAPSHOT_VERSION,
+                    *fingerprint_,
+                    _dumps(state),
+                ),
+            )
+
+    def state(self, source: str) -> Any:
+        """Return the additional state stored along with the advisories of 'source'."""
+        rows = self._query("SELECT state FROM sources WHERE name = ?", source)
+        return json.loads(rows[0][0]) if rows else None
+
+    def advisories(self, source: str, factory: AdvisoryFactory) -> "StoredAdvisories":
+        """Return a mapping of package names to advisories of 'source' queried on access."""
+        return StoredAdvisories(self, source, factory)
+
+    def get(self, source: str, name: str) -> Optional[List[Dict[str, Any]]]:
+        rows = self._query(
+            "SELECT payload FROM advisories WHERE source = ? AND canonical_name = ? "
+            "ORDER BY position",
+            source,
+            name,
+        )
+        return [json.loads(payload) for (payload,) in rows] or None
+
+    def names(self, source: str) -> List[NormalizedName]:
+        rows = self._query(
+            "SELECT DISTINCT canonical_name FROM advisories WHERE source = ?", source
+        )
+        return [NormalizedName(name) for (name,) in rows]
+
+    def count(self, source: str) -> int:
+        rows = self._query(
+            "SELECT COUNT(DISTINCT canonical_name) FROM advisories WHERE source = ?",
+            source,
+        )
+        return int(rows[0][0])
+
+
+class StoredAdvisories(MutableMapping[NormalizedName, List[Any]]):
+    """Mapping of package names to advisories backed by an AdvisoryStore.
+
+    Lookups are point queries against the store. Results are memoised so repeated lookups return
+    the same list; writes only affect this mapping and are never persisted.
+    """
+
+    _factory: AdvisoryFactory
+    _loaded: Dict[NormalizedName, Optional[List[Any]]]
+    _source: str
+    _store: AdvisoryStore
+
+    def __init__(
+        self, store: AdvisoryStore, source: str, factory: AdvisoryFactory
+    ) -> None:
+        self._factory = factory
+        self._loaded = {}
+        self._source = source
+        self._store = store
+
+    def __getitem__(self, name: NormalizedName) -> List[Any]:
+        if name not in self._loaded:
+            rows = self._store.get(self._source, name)
+            self._loaded[name] = (
+                None if rows is None else [self._factory(row) for row in rows]
+            )
+
+        advisories = self._loaded[name]
+        if advisories is None:
+            raise KeyError(name)
+        return advisories
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+
+        try:
+            self[NormalizedName(name)]
+        except KeyError:
+            return False
+        return True
+
+    def __setitem__(self, name: NormalizedName, advisories: List[Any]) -> None:
+        self._loaded[name] = advisories
+
+    def __delitem__(self, name: NormalizedName) -> None:
+        if name not in self:
+            raise KeyError(name)
+        self._loaded[name] = None
+
+    @property
+    def loaded_count(self) -> int:
+        """Return number of advisories fetched from the store so far."""
+        return sum(len(items) for items in self._loaded.values() if items is not None)
+
+    def _names(self) -> Dict[NormalizedName, None]:
+        names = dict.fromkeys(self._store.names(self._source))
+        for name, advisories in self._loaded.items():
+            if advisories is None:
+                names.pop(name, None)
+            else:
+                names[name] = None
+        return names
+
+    def __iter__(self) -> Iterator[NormalizedName]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        if not self._loaded:
+            return self._store.count(self._source)
+        return len(self._names())
+
+
+def _dumps(value: Any) -> str:
+    # Advisories parsed from YAML may contain dates.
+    return json.dumps(value, default=str)
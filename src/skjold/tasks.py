@@ -1,16 +1,64 @@
 """Contains actual task implementations that can be either called directly or via the click cli."""
+import copy
+import datetime
+import importlib
 import json
 import os
 import textwrap
-from typing import AbstractSet, Any, Dict, List, MutableMapping, Set, Tuple, Type, Union
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    TYPE_CHECKING,
+    AbstractSet,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 import click
 import toml
 
-from skjold.core import DependencyList, SecurityAdvisorySource, SkjoldException
+from skjold import timings
+from skjold.aliases import AliasGraph
+from skjold.core import (
+    Dependency,
+    DependencyList,
+    SecurityAdvisory,
+    SecurityAdvisorySource,
+    SkjoldException,
+)
 from skjold.ignore import SkjoldIgnore
 
+if TYPE_CHECKING:  # pragma: no cover
+    from packaging.utils import NormalizedName
+
+    from skjold.store import AdvisoryStore
+
 _sources: MutableMapping[str, Type[SecurityAdvisorySource]] = {}
+# Built-in sources are only imported once they are used. Importing one registers it.
+_SOURCE_IMPORT_PATHS: Mapping[str, str] = {
+    "gemnasium": "skjold.sources.gemnasium:Gemnasium",
+    "github": "skjold.sources.github:Github",
+    "osv": "skjold.sources.osv:OSV",
+    "pypa": "skjold.sources.pypa:PyPAAdvisoryDB",
+    "pyup": "skjold.sources.pyup:PyUp",
+}
+
+REPORT_FORMATS = ("cli", "json", "ndjson")
+STORAGE_BACKENDS = ("snapshot", "sqlite")
+STORE_FILENAME = "advisories.sqlite"
 
 
 def default_from_context(attr: str, cls: object) -> Type[click.Option]:
@@ -39,6 +87,11 @@ class Configuration:
     cache_expires: int = 12 * 3600  # Cache maximum age.
     ignore_file: str = ".skjoldignore"  # Default ignore file.
     verbose: bool = False  # Be verbose when processing package list.
+    jobs: int = 4  # Maximum number of sources to update/load concurrently.
+    storage: str = "snapshot"  # Keep parsed advisories in 'snapshot' files or 'sqlite'.
+    deduplicate: bool = (
+        True  # Merge findings of the same issue reported by several sources.
+    )
 
     def use(self, config: Dict) -> None:
         self.sources = config.get("sources", self.sources)
@@ -49,6 +102,14 @@ class Configuration:
             "SKJOLD_CACHE_DIR", config.get("cache_dir", self.default_cache_dir)
         )
         self.cache_expires = config.get("cache_expires", self.cache_expires)
+        self.jobs = int(config.get("jobs", self.jobs))
+        self.storage = config.get("storage", self.storage)
+        self.deduplicate = bool(config.get("deduplicate", self.deduplicate))
+        if self.storage not in STORAGE_BACKENDS:
+            raise click.ClickException(
+                f"Storage '{self.storage}' does not exist! "
+                f"Use one of: {', '.join(STORAGE_BACKENDS)}."
+            )
         self.ignore_file = os.environ.get(
             "SKJOLD_IGNORE_FILE", config.get("ignore_file", self.ignore_file)
         )
@@ -61,6 +122,12 @@ class Configuration:
                     f"Source with name '{source_name}' does not exist!"
                 )
 
+    @property
+    def merges_findings(self) -> bool:
+        """Return True if findings of the same issue reported by several sources are merged."""
+        # Merging waits for all sources, ndjson is meant to stream findings as they are found.
+        return self.deduplicate and self.report_format != "ndjson"
+
     @property
     def app_home(self) -> str:
         return str(click.get_app_dir("skjold", roaming=False, force_posix=True))
@@ -72,7 +139,7 @@ class Configuration:
     @property
     def available_sources(self) -> AbstractSet[str]:
         """Return list of available sources by name."""
-        return _sources.keys()
+        return get_registered_sources()
 
     def as_dict(self) -> MutableMapping[str, Union[bool, str, int, List]]:
         """Return dictionary representation of configuration object."""
@@ -84,12 +151,20 @@ class Configuration:
             "cache_dir": self.cache_dir,
             "cache_expires": self.cache_expires,
             "ignore_file": self.ignore_file,
+            "jobs": self.jobs,
+            "storage": self.storage,
+            "deduplicate": self.deduplicate,
         }
 
 
 def register_source(new_source_name: str, source: Type[SecurityAdvisorySource]) -> None:
     """Registers a new source by name. Throws Exception otherwise."""
-    if not new_source_name or new_source_name in _sources:
+    import_path = f"{source.__module__}:{source.__qualname__}"
+    if (
+        not new_source_name
+        or new_source_name in _sources
+        or _SOURCE_IMPORT_PATHS.get(new_source_name, import_path) != import_path
+    ):
         raise SkjoldException(
             f"A source named '{new_source_name}' appears to be already registered!"
         )
@@ -97,14 +172,41 @@ def register_source(new_source_name: str, source: Type[SecurityAdvisorySource])
     _sources[new_source_name] = source
 
 
+class _RegisteredSourceNames(AbstractSet[str]):
+    """Live view of the names of built-in and registered sources."""
+
+    def _names(self) -> Dict[str, None]:
+        return dict.fromkeys([*_SOURCE_IMPORT_PATHS, *_sources])
+
+    def __contains__(self, name: object) -> bool:
+        return name in _sources or name in _SOURCE_IMPORT_PATHS
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+
 def get_registered_sources() -> AbstractSet[str]:
     """Return list of keys for registered advisory sources."""
-    return _sources.keys()
+    return _RegisteredSourceNames()
 
 
 def is_registered_source(name: str) -> bool:
     """Return True if a resource by the given name exists. False otherwise."""
-    return name in _sources.keys()
+    return name in get_registered_sources()
+
+
+def get_source(name: str) -> Type[SecurityAdvisorySource]:
+    """Return the source registered by the given name, importing built-in sources on first use."""
+    if name not in _sources and name in _SOURCE_IMPORT_PATHS:
+        module, _, attr = _SOURCE_IMPORT_PATHS[name].partition(":")
+        _sources.setdefault(name, getattr(importlib.import_module(module), attr))
+
+    if name not in _sources:
+        raise SkjoldException(f"Source with name '{name}' does not exist!")
+    return _sources[name]
 
 
 def print_configuration(configuration: Configuration, stderr: bool = True) -> None:
@@ -117,21 +219,34 @@ def print_configuration(configuration: Configuration, stderr: bool = True) -> No
 
 
 def report(
-    configuration: Configuration, findings: List[Dict[str, Any]]
+    configuration: Configuration, findings: Iterable[Dict[str, Any]]
 ) -> Tuple[Set[str], List[str]]:
-    """Renders (ignored) findings and list of vulnerable packages to stdout and prints a short summary to stderr."""
-    vulnerable_packages, ignored_findings = set({}), []
-    for finding in findings:
-        if finding["ignored"]["ignored"]:
-            ignored_findings.append(finding["identifier"])
-        else:
-            vulnerable_packages.add(finding["name"])
+    """Renders (ignored) findings and list of vulnerable packages to stdout and prints a short summary to stderr.
+
+    Findings are consumed as they are produced; only 'json' needs to collect all of them first.
+    """
+    vulnerable_packages: Set[str] = set({})
+    ignored_findings: List[str] = []
+
+    def _count(findings_: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for finding_ in findings_:
+            if finding_["ignored"]["ignored"]:
+                ignored_findings.append(finding_["identifier"])
+            else:
+                vulnerable_packages.add(finding_["name"])
+            yield finding_
 
     if configuration.report_format == "json":
-        click.echo(json.dumps(findings, indent=2))
+        click.echo(json.dumps(list(_count(findings)), indent=2))
         return vulnerable_packages, ignored_findings
 
-    for finding in findings:
+    if configuration.report_format == "ndjson":
+        # One finding per line, flushed right away so consumers can start early.
+        for finding in _count(findings):
+            click.echo(json.dumps(finding))
+        return vulnerable_packages, ignored_findings
+
+    for finding in _count(findings):
         # https://nvd.nist.gov/vuln-metrics/cvss
         _color = {
             "NONE": "white",
@@ -142,6 +257,9 @@ def report(
             "CRITICAL": "red",
             "UNKNOWN": "red",
         }.get(finding["severity"])
+        # Merged findings list every source and identifier they were reported under.
+        _sources = ", ".join(finding.get("sources") or [finding["source"]])
+        _identifiers = ", ".join(finding.get("identifiers") or [finding["identifier"]])
 
         if finding["ignored"]["ignored"]:
             click.secho("")
@@ -151,9 +269,9 @@ def report(
             click.secho(" (", nl=False)
             click.secho(finding["versions"], fg=_color, nl=False)
             click.secho(") via ", nl=False)
-            click.secho(finding["source"], fg="cyan", nl=False)
+            click.secho(_sources, fg="cyan", nl=False)
             click.secho(" as ", nl=False)
-            click.secho(finding["identifier"], fg="yellow", nl=False)
+            click.secho(_identifiers, fg="yellow", nl=False)
             click.secho(" found in ", nl=False)
             click.secho(finding["__file__"]["path"], fg=_color, nl=False)
             click.secho(" ignored until ", nl=False)
@@ -171,9 +289,9 @@ def report(
         click.secho(" (", nl=False)
         click.secho(finding["versions"], fg=_color, nl=False)
         click.secho(") via ", nl=False)
-        click.secho(finding["source"], fg="cyan", nl=False)
+        click.secho(_sources, fg="cyan", nl=False)
         click.secho(" as ", nl=False)
-        click.secho(finding["identifier"], fg="yellow", nl=False)
+        click.secho(_identifiers, fg="yellow", nl=False)
         click.secho(" found in ", nl=False)
         click.secho(finding["__file__"]["path"], fg=_color, nl=False)
         click.secho("")
@@ -204,50 +322,364 @@ def report(
     return vulnerable_packages, ignored_findings
 
 
+def _open_store(configuration: Configuration) -> Optional["AdvisoryStore"]:
+    if configuration.storage != "sqlite":
+        return None
+
+    from skjold.store import AdvisoryStore
+
+    return AdvisoryStore(os.path.join(configuration.cache_dir, STORE_FILENAME))
+
+
+def _create_source(
+    name: str,
+    configuration: Configuration,
+    packages: Optional[AbstractSet["NormalizedName"]],
+    store: Optional["AdvisoryStore"],
+) -> SecurityAdvisorySource:
+    return get_source(name)(
+        cache_dir=configuration.cache_dir,
+        cache_expires=configuration.cache_expires,
+        packages=packages,
+        store=store,
+        jobs=configuration.jobs,
+    )
+
+
+RegistryKey = Tuple[str, str, int, str]
+
+
+@dataclass
+class RegistryEntry:
+    configuration: Configuration
+    source: SecurityAdvisorySource
+    created_at: float  # time.monotonic() the source was created at.
+    loaded_at: float  # time.time() the source was created at.
+    refresh_duration: Optional[
+        float
+    ] = None  # Seconds the last background refresh took.
+    refresh_error: Optional[str] = None  # Error of the last failed background refresh.
+
+
+class SourceRegistry:
+    """Keeps loaded sources alive so they can be reused across calls to `audit()`.
+
+    A source is replaced once it is older than `max_age` seconds or its local database requires an
+    update. If all sources together hold more than `max_advisories` advisories in memory the least
+    recently used ones are evicted. Callers must not use a registry from several audits at once.
+
+    With `background_refresh` enabled outdated sources keep being served until `refresh()` has
+    loaded their replacement, which is then swapped in atomically.
+    """
+
+    background_refresh: bool = False
+    max_age: int
+    max_advisories: int
+    _entries: "OrderedDict[RegistryKey, RegistryEntry]"
+    _lock: threading.Lock
+    _stores: Dict[str, "AdvisoryStore"]
+
+    def __init__(self, max_age: int = 3600, max_advisories: int = 500_000) -> None:
+        self.max_age = max_age
+        self.max_advisories = max_advisories
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stores = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _key(name: str, configuration: Configuration) -> RegistryKey:
+        return (
+            name,
+            configuration.cache_dir,
+            configuration.cache_expires,
+            configuration.storage,
+        )
+
+    def _is_outdated(self, entry: RegistryEntry) -> bool:
+        if time.monotonic() - entry.created_at >= self.max_age:
+            return True
+        return entry.source.requires_update
+
+    def _store_for(self, configuration: Configuration) -> Optional["AdvisoryStore"]:
+        if configuration.storage != "sqlite":
+            return None
+
+        from skjold.store import AdvisoryStore
+
+        with self._lock:
+            store = self._stores.get(configuration.cache_dir)
+            if store is None:
+                store = self._stores[configuration.cache_dir] = AdvisoryStore(
+                    os.path.join(configuration.cache_dir, STORE_FILENAME)
+                )
+            return store
+
+    def get(
+        self,
+        name: str,
+        configuration: Configuration,
+        packages: Optional[AbstractSet["NormalizedName"]],
+    ) -> SecurityAdvisorySource:
+        """Return the registered source for the given configuration or create a new one."""
+        key = self._key(name, configuration)
+        store = self._store_for(configuration)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                self.background_refresh or not self._is_outdated(entry)
+            ):
+                self._entries.move_to_end(key)
+                return entry.source
+
+            source = _create_source(name, configuration, packages, store)
+            self._entries[key] = RegistryEntry(
+                copy.copy(configuration), source, time.monotonic(), time.time()
+            )
+            return source
+
+    def discard(self, source: SecurityAdvisorySource) -> None:
+        """Remove the given source from the registry."""
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.source is source:
+                    del self._entries[key]
+
+    def evict(self) -> None:
+        """Drop least recently used sources until the advisory limit is satisfied."""
+        with self._lock:
+            total = sum(entry.source.loaded_count for entry in self._entries.values())
+            while total > self.max_advisories and len(self._entries) > 1:
+                _, entry = self._entries.popitem(last=False)
+                total -= entry.source.loaded_count
+
+    def refresh(self, force: bool = False) -> int:
+        """Load replacements for outdated (or all) sources and swap them in once loaded.
+
+        Sources keep being served while their replacement loads. A failed refresh is recorded and
+        retried on the next call. Returns the number of replaced sources.
+        """
+        with self._lock:
+            outdated = [
+                (key, entry)
+                for key, entry in self._entries.items()
+                if force or self._is_outdated(entry)
+            ]
+
+        replaced = 0
+        for key, entry in outdated:
+            started_at = time.monotonic()
+            try:
+                source = _create_source(
+                    key[0],
+                    entry.configuration,
+                    None,
+                    self._store_for(entry.configuration),
+                )
+                source.prepare()
+            except Exception as exc:
+                with self._lock:
+                    entry.refresh_duration = time.monotonic() - started_at
+                    entry.refresh_error = str(exc)
+                continue
+
+            with self._lock:
+                # Skip sources that have been evicted or replaced in the meantime.
+                if self._entries.get(key) is entry:
+                    self._entries[key] = RegistryEntry(
+                        entry.configuration,
+                        source,
+                        time.monotonic(),
+                        time.time(),
+                        refresh_duration=time.monotonic() - started_at,
+                    )
+                    replaced += 1
+
+        return replaced
+
+    def status(self) -> List[Dict[str, Any]]:
+        """Return load and refresh information for every registered source."""
+        with self._lock:
+            return [
+                {
+                    "name": key[0],
+                    "loaded_at": datetime.datetime.fromtimestamp(
+                        entry.loaded_at, tz=datetime.timezone.utc
+                    ).isoformat(),
+                    "refresh_duration": entry.refresh_duration,
+                    "refresh_error": entry.refresh_error,
+                    "advisories": entry.source.loaded_count,
+                }
+                for key, entry in self._entries.items()
+            ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+
+
+def load_sources(
+    configuration: Configuration,
+    packages: Optional[AbstractSet["NormalizedName"]],
+    registry: Optional[SourceRegistry] = None,
+) -> List[SecurityAdvisorySource]:
+    """Update and load all configured sources concurrently and return them in configured order.
+
+    Sources supporting it only load advisories for 'packages' unless it is None. If a registry is
+    given, previously loaded sources are taken from it and new ones are added.
+    """
+    if registry is not None:
+        sources = [
+            registry.get(name, configuration, packages)
+            for name in configuration.sources
+        ]
+    else:
+        store = _open_store(configuration)
+        sources = [
+            _create_source(name, configuration, packages, store)
+            for name in configuration.sources
+        ]
+    if not sources:
+        return sources
+
+    workers = max(1, min(configuration.jobs, len(sources)))
+    with timings.phase("sources"), ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(source.prepare) for source in sources]
+
+    errors = []
+    for name, source, future in zip(configuration.sources, sources, futures):
+        error = future.exception()
+        if error is not None:
+            errors.append(f"  {name}: {error}")
+            if registry is not None:
+                registry.discard(source)
+
+    if errors:
+        raise click.ClickException(
+            "Unable to load the following source(s):\n" + "\n".join(errors)
+        )
+
+    if registry is not None:
+        registry.evict()
+
+    return sources
+
+
 def audit(
     configuration: Configuration,
     dependencies: DependencyList,
     ignore: SkjoldIgnore,
+    registry: Optional[SourceRegistry] = None,
 ) -> List[Dict[str, Any]]:
-    """..."""
+    """Return all findings for the given dependencies. See `iter_audit`."""
+    return list(iter_audit(configuration, dependencies, ignore, registry))
+
+
+FindingAdvisories = Tuple[Dependency, List[Tuple[str, SecurityAdvisory]]]
 
-    findings = []
-    for name in configuration.sources:
-        source = _sources[name](
-            cache_dir=configuration.cache_dir, cache_expires=configuration.cache_expires
+
+def iter_audit(
+    configuration: Configuration,
+    dependencies: DependencyList,
+    ignore: SkjoldIgnore,
+    registry: Optional[SourceRegistry] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield findings for the given dependencies source by source as they are found.
+
+    If `Configuration.merges_findings`, findings describing the same issue under different identifiers
+    (aliases) for the same dependency are merged into one finding listing all 'identifiers' and
+    'sources'. Merging needs all sources to be matched first, so findings are only yielded once that is
+    done and all matches are held in memory until then.
+    """
+    packages = {dependency.canonical_name for dependency in dependencies}
+    timings.count("dependencies checked", len(dependencies))
+    sources = load_sources(configuration, packages, registry)
+
+    if not configuration.merges_findings:
+        for source in sources:
+            with timings.phase(f"{source.name}/match"):
+                matches = source.match_many(dependencies)
+            for dependency, advisories in matches:
+                for advisory in advisories:
+                    yield _finding(
+                        dependency, [(source.name, advisory)], ignore, advisory.aliases
+                    )
+        return
+
+    # Match all sources first so aliases found by one source apply to all others.
+    aliases = AliasGraph()
+    matched = []
+    for source in sources:
+        with timings.phase(f"{source.name}/match"):
+            matches = source.match_many(dependencies)
+        for _, advisories in matches:
+            for advisory in advisories:
+                aliases.add(_issue_key(advisory), advisory.aliases)
+        matched.append((source, matches))
+
+    # Findings of the same issue for the same dependency entry are merged into one.
+    findings: Dict[Tuple[int, str], FindingAdvisories] = {}
+    for source, matches in matched:
+        for dependency, advisories in matches:
+            for advisory in advisories:
+                issue = aliases.find(_issue_key(advisory))
+                item = findings.setdefault((id(dependency), issue), (dependency, []))
+                item[1].append((source.name, advisory))
+
+    for dependency, items in findings.values():
+        yield _finding(
+            dependency, items, ignore, aliases.group(_issue_key(items[0][1]))
         )
 
-        for dependency in dependencies:
-            if source.has_security_advisory_for(dependency):
-                is_vulnerable, advisories = source.is_vulnerable_package(dependency)
-
-                if is_vulnerable:
-                    for advisory in advisories:
-                        # Check if the advisories identifier is part of the ignore list.
-                        is_ignored, entry = ignore.should_ignore(
-                            advisory.identifier, advisory.package_name
-                        )
-                        findings.append(
-                            {
-                                "identifier": advisory.identifier,
-                                "severity": advisory.severity,
-                                "name": dependency.name,
-                                "version": dependency.version,
-                                "versions": advisory.vulnerable_versions,
-                                "source": source.name,
-                                "summary": advisory.summary,
-                                "references": advisory.references,
-                                "url": advisory.url,
-                                "ignored": {
-                                    "ignored": is_ignored,
-                                    "expires": entry.get("expires"),
-                                    "reason": entry.get("reason"),
-                                },
-                                "__file__": {
-                                    "path": dependency.source[0],
-                                    "lineno": dependency.source[1],
-                                },
-                            }
-                        )
-
-    return findings
+
+def _issue_key(advisory: SecurityAdvisory) -> str:
+    """Return the identifier used to group the given advisory with its aliases."""
+    # Some advisories lack an identifier (e.g. PyUp entries without a CVE); use an alias instead.
+    for identifier in [advisory.identifier, *advisory.aliases]:
+        if identifier:
+            return str(identifier)
+    return f"<{id(advisory)}>"
+
+
+def _finding(
+    dependency: Dependency,
+    items: List[Tuple[str, SecurityAdvisory]],
+    ignore: SkjoldIgnore,
+    aliases: Iterable[str],
+) -> Dict[str, Any]:
+    """Return a finding for advisories (by source name) describing the same issue."""
+    source, advisory = items[0]
+    # Check if the advisory or any of its aliases is part of the ignore list.
+    is_ignored, entry = ignore.should_ignore(
+        advisory.identifier, advisory.package_name, aliases
+    )
+    severities = [item.severity for _, item in items if item.severity != "UNKNOWN"]
+    return {
+        "identifier": advisory.identifier,
+        "identifiers": list(dict.fromkeys(_issue_key(item) for _, item in items)),
+        "severity": severities[0] if severities else advisory.severity,
+        "name": dependency.name,
+        "version": dependency.version,
+        "versions": advisory.vulnerable_versions,
+        "source": source,
+        "sources": list(dict.fromkeys(name for name, _ in items)),
+        "summary": advisory.summary,
+        "references": list(
+            dict.fromkeys(url for _, item in items for url in item.references)
+        ),
+        "url": advisory.url,
+        "ignored": {
+            "ignored": is_ignored,
+            "expires": entry.get("expires"),
+            "reason": entry.get("reason"),
+        },
+        "__file__": {
+            "path": dependency.source[0],
+            "lineno": dependency.source[1],
+        },
+    }
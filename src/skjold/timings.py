@@ -0,0 +1,177 @@
+"""Optional instrumentation recording wall time, CPU time and peak memory per phase plus counters."""
+import contextlib
+import json
+import threading
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, Iterator, Optional
+
+import click
+
+if TYPE_CHECKING:  # pragma: no cover
+    import cProfile
+
+
+@dataclass
+class PhaseTiming:
+    calls: int = 0
+    wall: float = 0.0
+    # CPU time of the thread running the phase; work done by worker processes is not included.
+    cpu: float = 0.0
+    # Highest amount of memory allocated by Python while the phase ran (in any thread) in bytes.
+    peak_memory: Optional[int] = None
+
+
+def _traces_peaks() -> bool:
+    return tracemalloc.is_tracing() and hasattr(tracemalloc, "reset_peak")
+
+
+class TimingsRecorder:
+    """Accumulates timings per phase name and counters. Safe to use from several threads.
+
+    Phases may nest or overlap (e.g. sources loaded concurrently), so their times don't add up.
+    """
+
+    counters: Dict[str, int]
+    phases: Dict[str, PhaseTiming]
+    _lock: threading.Lock
+    # Peak traced memory seen so far by every running phase, keyed by a token per run.
+    _peaks: Dict[int, int]
+
+    def __init__(self) -> None:
+        self.counters = {}
+        self.phases = {}
+        self._lock = threading.Lock()
+        self._peaks = {}
+
+    def _update_peaks(self) -> None:
+        """Fold the peak since the last call into all running phases and start over."""
+        if not _traces_peaks():
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        for token, value in self._peaks.items():
+            self._peaks[token] = max(value, peak)
+        tracemalloc.reset_peak()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        token = object()
+        with self._lock:
+            # Phases are listed in the order they were first started.
+            self.phases.setdefault(name, PhaseTiming())
+            # tracemalloc only has a single peak; keep the one reached so far for running phases.
+            self._update_peaks()
+            self._peaks[id(token)] = 0
+
+        started_at, cpu_started_at = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started_at
+            cpu = time.thread_time() - cpu_started_at
+            with self._lock:
+                self._update_peaks()
+                peak_memory = self._peaks.pop(id(token))
+                timing = self.phases[name]
+                timing.calls += 1
+                timing.wall += wall
+                timing.cpu += cpu
+                if _traces_peaks():
+                    timing.peak_memory = max(timing.peak_memory or 0, peak_memory)
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": {name: asdict(item) for name, item in self.phases.items()},
+                "counters": dict(self.counters),
+            }
+
+    def render(self) -> str:
+        """Return phases and counters as a plain text table."""
+        doc = self.as_dict()
+        width = max([len(name) for name in [*doc["phases"], *doc["counters"]]] + [7])
+        lines = [
+            f"{'phase':<{width}} {'calls':>7} {'wall':>10} {'cpu':>10} {'peak mem':>10}"
+        ]
+        for name, item in doc["phases"].items():
+            peak = item["peak_memory"]
+            peak_ = "-" if peak is None else f"{peak / 2 ** 20:.1f}MiB"
+            lines.append(
+                f"{name:<{width}} {item['calls']:>7} {item['wall']:>9.3f}s "
+                f"{item['cpu']:>9.3f}s {peak_:>10}"
+            )
+
+        if doc["counters"]:
+            lines.append("")
+            lines.append(f"{'counter':<{width}} {'value':>7}")
+            for name, value in doc["counters"].items():
+                lines.append(f"{name:<{width}} {value:>7}")
+        return "\n".join(lines)
+
+
+_recorder: Optional[TimingsRecorder] = None
+_disabled: ContextManager[None] = contextlib.nullcontext()
+
+
+def phase(name: str) -> ContextManager[None]:
+    """Record the enclosed block as phase 'name' if timings are being recorded."""
+    if _recorder is None:
+        return _disabled
+    return _recorder.phase(name)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add 'value' to counter 'name' if timings are being recorded."""
+    if _recorder is not None:
+        _recorder.count(name, value)
+
+
+@contextlib.contextmanager
+def recording(
+    show: bool = True, path: Optional[str] = None
+) -> Iterator[TimingsRecorder]:
+    """Record timings of the enclosed block as phase 'total' and report them once it is left.
+
+    Memory is traced using tracemalloc while recording, which slows down allocations. The table is
+    printed to stderr if 'show' is set; 'path' receives the timings as JSON.
+    """
+    global _recorder
+    # Per phase peaks need tracemalloc.reset_peak() (Python 3.9+).
+    started_tracing = (
+        hasattr(tracemalloc, "reset_peak") and not tracemalloc.is_tracing()
+    )
+    if started_tracing:
+        tracemalloc.start()
+
+    recorder = _recorder = TimingsRecorder()
+    try:
+        with recorder.phase("total"):
+            yield recorder
+    finally:
+        _recorder = None
+        if started_tracing:
+            tracemalloc.stop()
+        if show:
+            click.secho(recorder.render(), err=True)
+        if path:
+            with open(path, "w") as fh:
+                json.dump(recorder.as_dict(), fh, indent=2)
+
+
+@contextlib.contextmanager
+def profiled(path: str) -> Iterator["cProfile.Profile"]:
+    """Profile the enclosed block using cProfile and dump the statistics to 'path'."""
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,129 @@
+"""Version parsing and interval based matching of versions against specifier sets."""
+import bisect
+import functools
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+if TYPE_CHECKING:  # pragma: no cover
+    from packaging.specifiers import SpecifierSet
+    from packaging.version import Version
+
+T = TypeVar("T")
+
+# Bounds are inclusive; None denotes an unbounded side.
+Bound = Optional["Version"]
+Interval = Tuple[Bound, Bound]
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_version(version: str) -> "Version":
+    """Return the parsed Version for the given string, reusing previously parsed instances."""
+    # packaging is only imported once versions are needed; the cli starts faster without it.
+    from packaging.version import Version
+
+    return Version(version)
+
+
+def _public(version: "Version") -> "Version":
+    """Return 'version' without its local label which always sorts right after the public version."""
+    if version.local is None:
+        return version
+    return parse_version(version.public)
+
+
+def compile_specifier_set(specifier_set: "SpecifierSet") -> Optional[Interval]:
+    """Return a closed interval containing every version matched by 'specifier_set'.
+
+    The interval may be wider than the specifier set (e.g. for '!=' or wildcard specifiers) but is
+    never narrower. Bounds are public versions, so local versions have to be looked up by their
+    public part. Returns None if no version can match.
+    """
+    from packaging.version import InvalidVersion
+
+    lower: Bound = None
+    upper: Bound = None
+
+    for specifier in specifier_set:
+        operator, value = specifier.operator, specifier.version
+        if value.endswith(".*") or operator in {"!=", "~="}:
+            continue
+
+        try:
+            version = _public(parse_version(value))
+        except InvalidVersion:  # pragma: no cover
+            continue
+
+        if operator in {">", ">=", "==", "==="}:
+            lower = version if lower is None else max(lower, version)
+        if operator in {"<", "<=", "==", "==="}:
+            upper = version if upper is None else min(upper, version)
+
+    if lower is not None and upper is not None and lower > upper:
+        return None
+
+    return lower, upper
+
+
+class VersionIndex(Generic[T]):
+    """Sorted, non-overlapping version intervals pointing to the items whose ranges overlap them.
+
+    Looking up a version costs a single bisect. Items returned are only candidates and still have to
+    be confirmed against their actual specifiers as interval bounds are treated as inclusive.
+    """
+
+    _points: List["Version"]
+    _segments: List[Tuple[T, ...]]
+
+    def __init__(
+        self,
+        items: Sequence[T],
+        ranges: Callable[[T], Optional[Sequence["SpecifierSet"]]],
+    ) -> None:
+        intervals: List[Tuple[int, Interval]] = []
+        for position, item in enumerate(items):
+            specifier_sets = ranges(item)
+            if specifier_sets is None:
+                # Unknown ranges; the item is a candidate for every version.
+                intervals.append((position, (None, None)))
+                continue
+
+            for specifier_set in specifier_sets:
+                interval = compile_specifier_set(specifier_set)
+                if interval is not None:
+                    intervals.append((position, interval))
+
+        bounds = {bound for _, interval in intervals for bound in interval}
+        self._points = sorted(bound for bound in bounds if bound is not None)
+
+        # Segment j covers [points[j - 1], points[j]) with open ends for j == 0 and j == len(points).
+        covering: List[Dict[int, None]] = [{} for _ in range(len(self._points) + 1)]
+        for position, (lower, upper) in intervals:
+            first = 0 if lower is None else bisect.bisect_left(self._points, lower) + 1
+            last = (
+                len(self._points)
+                if upper is None
+                else bisect.bisect_left(self._points, upper) + 1
+            )
+            for segment in covering[first : last + 1]:
+                segment[position] = None
+
+        shared: Dict[Tuple[int, ...], Tuple[T, ...]] = {}
+        self._segments = []
+        for segment in covering:
+            key = tuple(sorted(segment))
+            if key not in shared:
+                shared[key] = tuple(items[position] for position in key)
+            self._segments.append(shared[key])
+
+    def candidates(self, version: "Version") -> Tuple[T, ...]:
+        """Return items whose ranges might contain 'version' in their original order."""
+        return self._segments[bisect.bisect_right(self._points, _public(version))]
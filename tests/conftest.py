@@ -1,6 +1,11 @@
+import io
+import json
 import os
+import tarfile
 import tempfile
-from typing import Generator
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Generator, List, Mapping, Optional
 
 import pytest
 
@@ -13,3 +18,119 @@ def cache_dir() -> Generator[str, None, None]:
         with tempfile.TemporaryDirectory(prefix="skjold_") as cache:
             assert os.path.exists(cache)
             yield cache
+
+
+@pytest.fixture
+def make_tarball() -> Callable[[str, Mapping[str, bytes]], str]:
+    """Return a function writing the given members into a gzipped tarball at 'path'."""
+
+    def _make_tarball(path: str, members: Mapping[str, bytes]) -> str:
+        with tarfile.open(path, mode="w:gz") as archive:
+            for name, data in members.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return path
+
+    return _make_tarball
+
+
+# A PyUp database listing a single vulnerability of urllib3 < 1.24.2.
+PYUP_ADVISORIES = {
+    "urllib3": [{"advisory": "...", "cve": "CVE-2019-11324", "specs": ["<1.24.2"]}]
+}
+
+
+@pytest.fixture
+def make_pyup_cache() -> Callable[..., str]:
+    """Return a function writing a PyUp database (PYUP_ADVISORIES by default) into 'cache_dir'."""
+
+    def _make_pyup_cache(
+        cache_dir: str, advisories: Optional[Mapping[str, List[Dict[str, Any]]]] = None
+    ) -> str:
+        path = os.path.join(cache_dir, "pyup.cache")
+        with open(path, "w") as fh:
+            json.dump(
+                {
+                    "$meta": {"timestamp": 1601532001},
+                    **(PYUP_ADVISORIES if advisories is None else advisories),
+                },
+                fh,
+            )
+        return path
+
+    return _make_pyup_cache
+
+
+class FakeHTTPServer(ThreadingHTTPServer):
+    """Local HTTP server serving `files` by path unless `handlers` has one for the request method.
+
+    `lengths` overrides the announced Content-Length, `etags` enables conditional requests and
+    the headers of every request are recorded in `requests`.
+    """
+
+    files: Dict[str, bytes]
+    lengths: Dict[str, int]
+    etags: Dict[str, str]
+    handlers: Dict[str, Callable[["FakeHTTPHandler"], None]]
+    requests: List[Dict[str, str]]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class FakeHTTPHandler(BaseHTTPRequestHandler):
+    server: FakeHTTPServer
+
+    def send_json(self, payload: Any) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self) -> None:
+        self.server.requests.append(
+            {name.lower(): value for name, value in self.headers.items()}
+        )
+        handler = self.server.handlers.get(self.command)
+        if handler is not None:
+            handler(self)
+            return
+
+        body = self.server.files[self.path]
+        etag = self.server.etags.get(self.path)
+        if etag is not None and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header(
+            "Content-Length", str(self.server.lengths.get(self.path, len(body)))
+        )
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _handle
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def http_server() -> Generator[FakeHTTPServer, None, None]:
+    server = FakeHTTPServer(("127.0.0.1", 0), FakeHTTPHandler)
+    server.files, server.lengths, server.etags = {}, {}, {}
+    server.handlers, server.requests = {}, []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,17 @@
+from skjold.aliases import AliasGraph
+
+
+def test_alias_graph_groups_identifiers_transitively() -> None:
+    graph = AliasGraph()
+    graph.add("PYSEC-2020-149", ["CVE-2020-26137"])
+    graph.add("GHSA-wqvq-5m8c-6g24", ["CVE-2020-26137"])
+    graph.add("CVE-2019-11324")
+
+    assert sorted(graph.group("GHSA-wqvq-5m8c-6g24")) == [
+        "CVE-2020-26137",
+        "GHSA-wqvq-5m8c-6g24",
+        "PYSEC-2020-149",
+    ]
+    assert graph.find("PYSEC-2020-149") == graph.find("GHSA-wqvq-5m8c-6g24")
+    assert graph.group("CVE-2019-11324") == ["CVE-2019-11324"]
+    assert "CVE-2019-11324" in graph and "CVE-0000-0000" not in graph
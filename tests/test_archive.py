@@ -0,0 +1,86 @@
+import os
+from pathlib import Path
+from typing import Callable, List, Mapping
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from skjold import archive
+from skjold.archive import iter_tarball_members, iter_yaml_members
+
+
+def test_iter_tarball_members_yields_matching_members_in_order(
+    tmp_path: Path, make_tarball: Callable[[str, Mapping[str, bytes]], str]
+) -> None:
+    path = make_tarball(
+        os.path.join(tmp_path, "archive.tar.gz"),
+        {
+            "db/pypi/a/1.yml": b"a",
+            "db/npm/b/2.yml": b"b",
+            "db/pypi/c/3.yml": b"c",
+            "db/pypi/README.md": b"d",
+        },
+    )
+
+    members = [
+        (name, fh.read())
+        for name, fh in iter_tarball_members(
+            path, lambda name: "/pypi/" in name and name.endswith(".yml")
+        )
+    ]
+    assert members == [("db/pypi/a/1.yml", b"a"), ("db/pypi/c/3.yml", b"c")]
+
+
+@pytest.mark.parametrize(
+    "max_workers, min_members", [(1, 0), (2, 1000), (2, 2), (3, 0)]
+)
+def test_iter_yaml_members_yields_documents_in_archive_order(
+    tmp_path: Path,
+    make_tarball: Callable[[str, Mapping[str, bytes]], str],
+    max_workers: int,
+    min_members: int,
+) -> None:
+    members = {f"db/pypi/p{i}/{i}.yml": f"id: {i}\n".encode() for i in range(250)}
+    path = make_tarball(os.path.join(tmp_path, "archive.tar.gz"), members)
+
+    documents = list(
+        iter_yaml_members(
+            path,
+            lambda name: name.endswith(".yml"),
+            max_workers=max_workers,
+            min_members=min_members,
+        )
+    )
+    assert documents == [(f"db/pypi/p{i}/{i}.yml", {"id": i}) for i in range(250)]
+
+
+def test_iter_yaml_members_parses_while_streaming_by_default(
+    tmp_path: Path, make_tarball: Callable[[str, Mapping[str, bytes]], str]
+) -> None:
+    members = {f"db/pypi/p{i}/{i}.yml": f"id: {i}\n".encode() for i in range(10)}
+    path = make_tarball(os.path.join(tmp_path, "archive.tar.gz"), members)
+    seen: List[str] = []
+
+    def predicate(name: str) -> bool:
+        seen.append(name)
+        return True
+
+    documents = iter_yaml_members(path, predicate)
+    assert next(documents) == ("db/pypi/p0/0.yml", {"id": 0})
+    assert seen == ["db/pypi/p0/0.yml"]
+
+
+def test_iter_yaml_members_parses_in_process_while_pool_is_busy(
+    tmp_path: Path,
+    make_tarball: Callable[[str, Mapping[str, bytes]], str],
+    monkeypatch: MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(archive, "ProcessPoolExecutor", None)
+    members = {f"db/pypi/p{i}/{i}.yml": f"id: {i}\n".encode() for i in range(10)}
+    path = make_tarball(os.path.join(tmp_path, "archive.tar.gz"), members)
+
+    with archive._pool_lock:
+        documents = list(
+            iter_yaml_members(path, lambda name: True, max_workers=4, min_members=0)
+        )
+    assert [document for _, document in documents] == [{"id": i} for i in range(10)]
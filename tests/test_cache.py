@@ -0,0 +1,110 @@
+import json
+import os
+import pickle
+from pathlib import Path
+
+from skjold.cache import (
+    SNAPSHOT_VERSION,
+    atomic_write,
+    fingerprint,
+    read_snapshot,
+    write_snapshot,
+)
+
+
+def test_fingerprint_changes_with_content(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache")
+    with open(path, "wb") as fh:
+        fh.write(b"first")
+    first = fingerprint(path)
+    assert first == fingerprint(path)
+
+    with open(path, "wb") as fh:
+        fh.write(b"second")
+    assert fingerprint(path) != first
+
+
+def test_fingerprint_ignores_mtime(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache")
+    with open(path, "wb") as fh:
+        fh.write(b"first")
+    first = fingerprint(path)
+
+    os.utime(path, (0, 0))
+    assert fingerprint(path) == first
+
+
+def test_fingerprint_is_only_computed_again_once_the_file_changes(
+    tmp_path: Path,
+) -> None:
+    path = os.path.join(tmp_path, "source.cache")
+    with open(path, "wb") as fh:
+        fh.write(b"first")
+    first = fingerprint(path)
+    assert os.path.exists(f"{path}.fingerprint")
+
+    # Same size and mtime: the stored digest is used without reading the file.
+    stat = os.stat(path)
+    with open(path, "r+b") as fh:
+        fh.write(b"other")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert fingerprint(path) == first
+
+    os.utime(path, (0, 0))
+    assert fingerprint(path) != first
+
+
+def test_snapshot_roundtrip_requires_matching_fingerprint(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache.snapshot")
+    write_snapshot(path, (2, "abc"), {"package": ["advisory"]})
+
+    assert read_snapshot(path, (2, "abc")) == {"package": ["advisory"]}
+    assert read_snapshot(path, (2, "abd")) is None
+    assert read_snapshot(path + ".missing", (2, "abc")) is None
+
+
+def test_snapshot_ignores_other_versions_and_garbage(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache.snapshot")
+    with open(path, "w") as fh:
+        json.dump(
+            {"version": SNAPSHOT_VERSION + 1, "fingerprint": [2, "abc"], "payload": {}},
+            fh,
+        )
+    assert read_snapshot(path, (2, "abc")) is None
+
+    # Pickles are never loaded; they could run arbitrary code.
+    with open(path, "wb") as fh:
+        pickle.dump((SNAPSHOT_VERSION, (2, "abc"), {}), fh)
+    assert read_snapshot(path, (2, "abc")) is None
+
+    with open(path, "wb") as fh:
+        fh.write(b"\x00garbage")
+    assert read_snapshot(path, (2, "abc")) is None
+
+
+def test_atomic_write_follows_umask(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache")
+    with atomic_write(path, "w") as fh:
+        fh.write("complete")
+
+    with open(os.path.join(tmp_path, "reference"), "w"):
+        pass
+    mode = os.stat(os.path.join(tmp_path, "reference")).st_mode
+    assert os.stat(path).st_mode == mode
+
+
+def test_atomic_write_keeps_previous_file_on_error(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "source.cache")
+    with atomic_write(path, "w") as fh:
+        fh.write("complete")
+
+    try:
+        with atomic_write(path, "w") as fh:
+            fh.write("trunc")
+            raise RuntimeError("interrupted")
+    except RuntimeError:
+        pass
+
+    with open(path) as fh:
+        assert fh.read() == "complete"
+    assert os.listdir(tmp_path) == ["source.cache"]
@@ -1,6 +1,8 @@
 import json
 import os
-from typing import Generator
+import subprocess
+import sys
+from typing import Any, Dict, Generator, List
 
 import click.testing
 import pytest
@@ -8,6 +10,7 @@ from _pytest.monkeypatch import MonkeyPatch
 from click.testing import make_input_stream
 
 import skjold
+import skjold.cli
 from skjold.cli import cli
 from skjold.tasks import Configuration
 
@@ -57,6 +60,27 @@ def test_vulnerable_package_via_cli(
     assert "via github" in result.stdout
 
 
+def test_cli_keeps_order_of_sources(
+    runner: click.testing.CliRunner, cache_dir: str, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setenv("SKJOLD_CACHE_DIR", cache_dir)
+    used: List[List[str]] = []
+
+    def iter_audit(config: Configuration, *args: Any, **kwargs: Any) -> List[Dict]:
+        used.append(config.sources)
+        return []
+
+    monkeypatch.setattr(skjold.cli, "iter_audit", iter_audit)
+    input_ = make_input_stream("urllib3==1.23", "utf-8")
+    setattr(input_, "name", "<stdin>")
+
+    sources = ["pyup", "pypa", "github", "pypa", "gemnasium"]
+    args = ["audit"] + [arg for name in sources for arg in ["-s", name]] + ["-"]
+    result = runner.invoke(cli, args=args, input=input_)
+    assert result.exit_code == 0
+    assert used == [["pyup", "pypa", "github", "gemnasium"]]
+
+
 def test_vulnerable_package_with_ignore_list_via_env(
     runner: click.testing.CliRunner, cache_dir: str, monkeypatch: MonkeyPatch
 ) -> None:
@@ -277,3 +301,34 @@ def test_cli_configuration_used_by_default(
     assert len(json_) > 0
     assert json_[0]["name"] == "urllib3"
     assert json_[0]["source"] == "gemnasium"
+
+
+def test_cli_import_skips_sources_and_their_dependencies() -> None:
+    """Ensure that starting the cli neither imports any source nor their dependencies.
+
+    The time taken by 'import skjold.cli' is tracked by 'benchmarks/bench_suite.py'.
+    """
+    code = "import sys, skjold.cli; print(' '.join(sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        universal_newlines=True,
+    )
+
+    modules = set(result.stdout.split())
+    for module in [
+        "skjold.sources.github",
+        "skjold.sources.pyup",
+        "skjold.server",
+        "yaml",
+        "tarfile",
+        "urllib.request",
+        "multiprocessing",
+        "packaging",
+        "packaging.specifiers",
+        "sqlite3",
+        "skjold.store",
+    ]:
+        assert module not in modules
@@ -61,3 +61,15 @@ def test_correct_cvss_score_and_severity_from_vector(
 
     assert cvss.score == score
     assert cvss.severity == severity
+
+
+def test_parsed_vectors_are_shared_and_scored_using_tables() -> None:
+    vector = "CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H"
+    cvss = parse_cvss(vector)
+    assert parse_cvss(vector) is cvss
+    assert (cvss.score, cvss.severity) == (9.8, "CRITICAL")
+
+    # All combinations of base metrics are covered by the tables.
+    assert len(CVSS2._score_table()) == 3**6
+    assert len(CVSS3._score_table()) == 4 * 2 * 3 * 2 * 2 * 3 * 3 * 3
+    assert CVSS3._score_table()[cvss._key] == (9.8, "CRITICAL")
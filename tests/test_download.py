@@ -0,0 +1,111 @@
+import gzip
+import os
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+from conftest import FakeHTTPServer
+from skjold.core import SkjoldException
+from skjold.download import download, verify_gzip, verify_json
+
+
+def _url(server: FakeHTTPServer, path: str) -> str:
+    return f"{server.url}{path}"
+
+
+def _files_in(path: Path) -> Dict[str, bytes]:
+    return {name: (path / name).read_bytes() for name in os.listdir(path)}
+
+
+def test_download_streams_response_to_path(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    body = os.urandom(256 * 1024)
+    http_server.files["/db.json"] = body
+
+    assert download(_url(http_server, "/db.json"), str(tmp_path / "db.cache"))
+
+    assert _files_in(tmp_path) == {"db.cache": body}
+
+
+def test_download_keeps_existing_file_on_incomplete_response(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    (tmp_path / "db.cache").write_bytes(b"previous")
+    http_server.files["/db.json"] = b"truncated"
+    http_server.lengths["/db.json"] = 1024
+
+    with pytest.raises(SkjoldException):
+        download(_url(http_server, "/db.json"), str(tmp_path / "db.cache"))
+
+    assert _files_in(tmp_path) == {"db.cache": b"previous"}
+
+
+def test_download_verifies_gzip_before_replacing(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    archive = gzip.compress(os.urandom(64 * 1024))
+    http_server.files["/ok.tar.gz"] = archive
+    http_server.files["/corrupt.tar.gz"] = archive[: len(archive) // 2]
+    path = str(tmp_path / "db.cache")
+
+    download(_url(http_server, "/ok.tar.gz"), path, verify=verify_gzip)
+    assert _files_in(tmp_path) == {"db.cache": archive}
+
+    with pytest.raises(SkjoldException):
+        download(_url(http_server, "/corrupt.tar.gz"), path, verify=verify_gzip)
+    assert _files_in(tmp_path) == {"db.cache": archive}
+
+
+def test_download_verifies_json_before_replacing(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    http_server.files["/ok.json"] = b'{"package": []}'
+    http_server.files["/truncated.json"] = b'{"package": ['
+    path = str(tmp_path / "db.cache")
+
+    download(_url(http_server, "/ok.json"), path, verify=verify_json)
+    with pytest.raises(SkjoldException):
+        download(_url(http_server, "/truncated.json"), path, verify=verify_json)
+    assert _files_in(tmp_path) == {"db.cache": b'{"package": []}'}
+
+
+def test_download_revalidates_using_etag(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    http_server.files["/db.json"] = b"first"
+    http_server.etags["/db.json"] = '"v1"'
+    path = tmp_path / "db.cache"
+
+    assert download(_url(http_server, "/db.json"), str(path))
+    assert "if-none-match" not in http_server.requests[-1]
+    os.utime(path, (0, 0))
+
+    # Unchanged upstream; only the mtime of the cache is updated.
+    assert not download(_url(http_server, "/db.json"), str(path))
+    assert http_server.requests[-1]["if-none-match"] == '"v1"'
+    assert path.read_bytes() == b"first"
+    assert path.stat().st_mtime > 0
+
+    http_server.files["/db.json"] = b"second"
+    http_server.etags["/db.json"] = '"v2"'
+    assert download(_url(http_server, "/db.json"), str(path))
+    assert path.read_bytes() == b"second"
+    assert sorted(os.listdir(tmp_path)) == ["db.cache", "db.cache.meta"]
+
+
+def test_download_skips_validators_for_other_urls_or_missing_files(
+    http_server: FakeHTTPServer, tmp_path: Path
+) -> None:
+    http_server.files["/a.json"] = http_server.files["/b.json"] = b"data"
+    http_server.etags["/a.json"] = http_server.etags["/b.json"] = '"v1"'
+    path = tmp_path / "db.cache"
+
+    assert download(_url(http_server, "/a.json"), str(path))
+    assert download(_url(http_server, "/b.json"), str(path))
+    assert "if-none-match" not in http_server.requests[-1]
+
+    path.unlink()
+    assert download(_url(http_server, "/b.json"), str(path))
+    assert "if-none-match" not in http_server.requests[-1]
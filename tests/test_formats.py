@@ -1,5 +1,7 @@
 import io
 import os
+import shutil
+from pathlib import Path
 from typing import Iterator, List, Optional, Tuple
 
 import pytest
@@ -8,7 +10,9 @@ from packaging.utils import NormalizedName
 from skjold.core import Dependency
 from skjold.formats import (
     _extract_package_list_from,
+    discover_dependency_files,
     extract_dependencies_from_files,
+    extract_dependencies_from_paths,
     read_requirements_txt_from,
 )
 from skjold.tasks import Configuration
@@ -49,7 +53,6 @@ def test_extract_dependencies_using_minimal_examples(
 def test_extract_package_versions_from_with_poetry_lock(
     folder: str, filename: str, format_: Optional[str]
 ) -> None:
-
     with open(format_fixture_path_for(folder, filename)) as fh:
         packages = list(_extract_package_list_from(Configuration(), fh, format_))
         assert len(packages) > 0
@@ -166,3 +169,44 @@ def test_extract_package_versions_from_file_with_hashes() -> None:
             Dependency("atomicwrites", "1.3.0", (path_, 10)),
             Dependency("attrs", "19.3.0", (path_, 13)),
         ]
+
+
+def _monorepo(root: Path) -> List[str]:
+    for service, filename in [
+        ("a", "poetry.lock"),
+        ("b", "Pipfile.lock"),
+        ("b/nested", "requirements.txt"),
+        (".venv", "requirements.txt"),
+    ]:
+        os.makedirs(root / service, exist_ok=True)
+        shutil.copy(format_fixture_path_for("minimal", filename), root / service)
+    (root / "a" / "README.md").write_text("poetry.lock")
+
+    return [
+        str(root / "a" / "poetry.lock"),
+        str(root / "b" / "Pipfile.lock"),
+        str(root / "b" / "nested" / "requirements.txt"),
+    ]
+
+
+def test_discover_dependency_files_skips_hidden_directories(tmp_path: Path) -> None:
+    paths = _monorepo(tmp_path)
+    assert discover_dependency_files(str(tmp_path)) == paths
+
+
+@pytest.mark.parametrize("max_workers, min_files", [(1, 1), (2, 1), (2, 100)])
+def test_extract_dependencies_from_paths_keeps_order_and_source(
+    tmp_path: Path, max_workers: int, min_files: int
+) -> None:
+    paths = _monorepo(tmp_path)
+    expected: List[Dependency] = []
+    for path in paths:
+        with open(path) as fh:
+            expected.extend(_extract_package_list_from(Configuration(), fh))
+
+    dependencies = list(
+        extract_dependencies_from_paths(paths, max_workers, min_files=min_files)
+    )
+
+    assert dependencies == expected
+    assert {dependency.source[0] for dependency in dependencies} == set(paths)
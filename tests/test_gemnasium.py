@@ -1,11 +1,18 @@
 import os
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping
+from unittest import mock
 
 import pytest
 import yaml
+from packaging.utils import NormalizedName
 
 from skjold.core import Dependency
-from skjold.sources.gemnasium import Gemnasium, GemnasiumSecurityAdvisory
+from skjold.sources.gemnasium import (
+    Gemnasium,
+    GemnasiumSecurityAdvisory,
+    _package_from_member_name,
+)
 
 
 def gemnasium_advisory_yml(name: str) -> Any:
@@ -81,11 +88,12 @@ def test_ensure_gemnasium_advisory_from_yaml_with_empty_affected_range_string()
 
 
 def test_ensure_gemnasium_advisory_from_yaml_with_no_cvss_vector() -> None:
-    obj = GemnasiumSecurityAdvisory.using(gemnasium_advisory_yml("CVE-2014-1932.yml"))
+    doc = gemnasium_advisory_yml("CVE-2014-1932.yml")
 
-    # Drop any vectors that might be present.
-    obj._json.pop("cvss_v3", None)
-    obj._json.pop("cvss_v2", None)
+    # Drop any vectors that might be present. Severity is computed when loading.
+    doc.pop("cvss_v3", None)
+    doc.pop("cvss_v2", None)
+    obj = GemnasiumSecurityAdvisory.using(doc)
 
     assert obj.package_name == "Pillow"
     assert obj.identifier == "CVE-2014-1932"
@@ -164,3 +172,80 @@ def test_ensure_gemnasium_update(cache_dir: str) -> None:
 
     found, findings = source.is_vulnerable_package(Dependency("Django", "3.2.25"))
     assert found is False and len(findings) == 0
+
+
+def gemnasium_archive_members() -> Dict[str, bytes]:
+    fixtures = os.path.join(os.path.dirname(__file__), "fixtures", "gemnasium")
+    members = {}
+    for name in ["CVE-2014-1932.yml", "CVE-2019-19844.yml", "CVE-2020-28476.yml"]:
+        with open(os.path.join(fixtures, name), "rb") as fh:
+            slug = yaml.safe_load(fh)["package_slug"]
+            fh.seek(0)
+            members[f"gemnasium-db-master/{slug}/{name}"] = fh.read()
+    members["gemnasium-db-master/npm/lodash/CVE-2019-10744.yml"] = b"invalid: ["
+    return members
+
+
+def test_ensure_gemnasium_populate_from_cache(
+    tmp_path: Path, make_tarball: Callable[[str, Mapping[str, bytes]], str]
+) -> None:
+    source = Gemnasium(str(tmp_path), 3600)
+    make_tarball(source.path, gemnasium_archive_members())
+    source.populate_from_cache()
+
+    assert sorted(source._advisories.keys()) == ["django", "pillow", "tornado"]
+    found, findings = source.is_vulnerable_package(Dependency("Django", "2.2.8"))
+    assert found and findings[0].identifier == "CVE-2019-19844"
+
+
+def test_ensure_gemnasium_partial_loading(
+    tmp_path: Path, make_tarball: Callable[[str, Mapping[str, bytes]], str]
+) -> None:
+    make_tarball(os.path.join(tmp_path, "gemnasium.cache"), gemnasium_archive_members())
+
+    source = Gemnasium(str(tmp_path), 3600, packages={NormalizedName("django")})
+    assert source.has_security_advisory_for(Dependency("Django", "2.2.8"))
+    assert sorted(source._advisories.keys()) == ["django"]
+
+    # Packages outside of the given set are parsed on demand.
+    assert source.has_security_advisory_for(Dependency("Pillow", "2.3.0"))
+    assert sorted(source._advisories.keys()) == ["django", "pillow"]
+
+    # The snapshot remembers covered packages so only missing ones get parsed.
+    source = Gemnasium(
+        str(tmp_path), 3600, packages={NormalizedName("django"), NormalizedName("six")}
+    )
+    with mock.patch(
+        "skjold.sources.gemnasium._package_from_member_name",
+        side_effect=_package_from_member_name,
+    ) as spy:
+        assert not source.has_security_advisory_for(Dependency("six", "1.0.0"))
+        assert spy.call_count == 3
+        assert not source.has_security_advisory_for(Dependency("six", "1.0.0"))
+        assert spy.call_count == 3
+
+    assert sorted(source._advisories.keys()) == ["django", "pillow"]
+
+    source = Gemnasium(str(tmp_path), 3600)
+    assert sorted(source.advisories.keys()) == ["django", "pillow", "tornado"]
+
+
+def test_ensure_vulnerable_version_range_is_compiled_once() -> None:
+    obj = GemnasiumSecurityAdvisory.using(
+        {"affected_range": "<1.11.27||>=2.2,<2.2.9", "package_slug": "pypi/package"}
+    )
+    assert obj.vulnerable_version_range is obj.vulnerable_version_range
+    assert obj.is_affected("2.2.8")
+
+
+def test_severity_is_computed_once_while_loading() -> None:
+    doc = gemnasium_advisory_yml("CVE-2019-19844.yml")
+    obj = GemnasiumSecurityAdvisory.using(doc)
+    doc.pop("cvss_v3")
+    assert obj.severity == "CRITICAL"
+
+    obj = GemnasiumSecurityAdvisory.using(
+        {"cvss_v3": "CVSS:3.1/AV:N", "cvss_v2": "AV:N/AC:L/Au:N/C:N/I:N/A:C"}
+    )
+    assert obj.severity == "HIGH"
+    assert GemnasiumSecurityAdvisory.using({"cvss_v2": "AV"}).severity == "UNKNOWN"
@@ -1,10 +1,17 @@
-from typing import Any, Dict, Union
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Union
 
 import click
 import pytest
 from _pytest.monkeypatch import MonkeyPatch
 
-from skjold.sources.github import Github, GithubSecurityAdvisory
+from skjold.sources.github import (
+    Github,
+    GithubSecurityAdvisory,
+    _fetch_github_security_advisories,
+)
 
 
 @pytest.fixture
@@ -116,3 +123,140 @@ def test_ensure_missing_github_token_raises_usage_error(
     with pytest.raises(click.UsageError):
         gh = Github(cache_dir, 0)
         gh.update()
+
+
+def _vulnerability(ghsa_id: str, updated_at: str, version_range: str = "< 1.0") -> Dict:
+    return {
+        "node": {
+            "advisory": {
+                "ghsaId": ghsa_id,
+                "identifiers": [{"type": "GHSA", "value": ghsa_id}],
+                "references": [],
+                "summary": ghsa_id,
+            },
+            "firstPatchedVersion": None,
+            "package": {"ecosystem": "PIP", "name": "example"},
+            "severity": "LOW",
+            "updatedAt": updated_at,
+            "vulnerableVersionRange": version_range,
+        }
+    }
+
+
+def test_fetch_stops_paging_at_known_vulnerabilities(mocker: Any) -> None:
+    pages = [
+        (4, "a", True, [_vulnerability("GHSA-4", "2021-04-01T00:00:00Z")]),
+        (4, "b", True, [_vulnerability("GHSA-3", "2021-03-01T00:00:00Z")]),
+        (4, "c", True, [_vulnerability("GHSA-2", "2021-02-01T00:00:00Z")]),
+        (4, None, False, [_vulnerability("GHSA-1", "2021-01-01T00:00:00Z")]),
+    ]
+    query = mocker.patch(
+        "skjold.sources.github._query_github_graphql", side_effect=pages
+    )
+
+    items = list(_fetch_github_security_advisories(since="2021-03-01T00:00:00Z"))
+
+    assert [item["node"]["advisory"]["ghsaId"] for item in items] == [
+        "GHSA-4",
+        "GHSA-3",
+    ]
+    assert query.call_count == 3
+
+
+def test_update_merges_changed_vulnerabilities_into_cache(
+    tmp_path: Path, mocker: Any
+) -> None:
+    known = [
+        _vulnerability("GHSA-2", "2021-02-01T00:00:00Z", "< 2.0"),
+        _vulnerability("GHSA-1", "2021-01-01T00:00:00Z", "< 1.0"),
+        _vulnerability("GHSA-1", "2021-01-01T00:00:00Z", ">= 3.0, < 3.1"),
+        _vulnerability("GHSA-0", "2020-12-01T00:00:00Z", "< 0.5"),
+    ]
+    (tmp_path / "github.cache").write_text(json.dumps(known))
+    changed: List[Dict] = [
+        _vulnerability("GHSA-3", "2021-03-01T00:00:00Z", "< 3.0"),
+        # The range of GHSA-1 has been corrected and its second range withdrawn.
+        _vulnerability("GHSA-1", "2021-02-15T00:00:00Z", "< 0.9"),
+    ]
+    query = mocker.patch(
+        "skjold.sources.github._query_github_graphql",
+        return_value=(3, None, False, changed + known[:1]),
+    )
+
+    source = Github(str(tmp_path), 0)
+    source.update()
+
+    data = json.loads((tmp_path / "github.cache").read_text())
+    assert query.call_count == 1
+    assert [
+        (item["node"]["advisory"]["ghsaId"], item["node"]["vulnerableVersionRange"])
+        for item in data
+    ] == [
+        ("GHSA-3", "< 3.0"),
+        ("GHSA-1", "< 0.9"),
+        ("GHSA-2", "< 2.0"),
+        ("GHSA-0", "< 0.5"),
+    ]
+
+
+def test_update_keeps_refetched_ranges_of_changed_advisories(
+    tmp_path: Path, mocker: Any
+) -> None:
+    known = [
+        _vulnerability("GHSA-1", "2021-01-01T00:00:00Z", "< 1.5"),
+        _vulnerability("GHSA-1", "2021-01-01T00:00:00Z", ">= 2.0, < 2.3"),
+    ]
+    (tmp_path / "github.cache").write_text(json.dumps(known))
+    # GHSA-1 gained another range; the known ones are returned again with the same timestamp.
+    added = _vulnerability("GHSA-1", "2021-02-01T00:00:00Z", ">= 3.0, < 3.1")
+    mocker.patch(
+        "skjold.sources.github._query_github_graphql",
+        return_value=(3, None, False, [added] + json.loads(json.dumps(known))),
+    )
+
+    Github(str(tmp_path), 0).update()
+
+    data = json.loads((tmp_path / "github.cache").read_text())
+    assert [item["node"]["vulnerableVersionRange"] for item in data] == [
+        ">= 3.0, < 3.1",
+        "< 1.5",
+        ">= 2.0, < 2.3",
+    ]
+
+
+def test_update_without_changes_only_touches_cache(tmp_path: Path, mocker: Any) -> None:
+    known = [_vulnerability("GHSA-1", "2021-01-01T00:00:00Z")]
+    path = tmp_path / "github.cache"
+    path.write_text(json.dumps(known))
+    os.utime(path, (0, 0))
+    # The newest known vulnerability is returned again as it is not older than itself.
+    mocker.patch(
+        "skjold.sources.github._query_github_graphql",
+        return_value=(1, None, False, json.loads(json.dumps(known))),
+    )
+
+    Github(str(tmp_path), 0).update()
+
+    assert json.loads(path.read_text()) == known
+    assert path.stat().st_mtime > 0
+
+
+def test_update_fetches_everything_for_caches_without_identifiers(
+    tmp_path: Path, mocker: Any
+) -> None:
+    outdated = _vulnerability("GHSA-1", "2021-01-01T00:00:00Z")
+    del outdated["node"]["advisory"]["identifiers"]
+    path = tmp_path / "github.cache"
+    path.write_text(
+        json.dumps([outdated, _vulnerability("GHSA-2", "2021-02-01T00:00:00Z")])
+    )
+    current = [_vulnerability("GHSA-1", "2021-01-01T00:00:00Z")]
+    fetch = mocker.patch(
+        "skjold.sources.github._fetch_github_security_advisories",
+        return_value=iter(current),
+    )
+
+    Github(str(tmp_path), 0).update()
+
+    fetch.assert_called_once_with(since=None)
+    assert json.loads(path.read_text()) == current
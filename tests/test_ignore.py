@@ -1,6 +1,6 @@
 import datetime
 import os
-from typing import Dict
+from typing import Any, Dict
 
 import pytest
 
@@ -83,3 +83,41 @@ def test_ignore_add_item(ignorelist: SkjoldIgnore) -> None:
         "reason": reason,
         "expires": expires.strftime(SkjoldIgnore.EXPIRES_FMT),
     }
+
+
+def test_should_ignore_matches_aliases_and_canonical_names(
+    ignorelist: SkjoldIgnore,
+) -> None:
+    ignored, entry = ignorelist.should_ignore(
+        "GHSA-wqvq-5m8c-6g24", "URLLib3", ["CVE-2020-26137"]
+    )
+    assert ignored
+    assert entry["package"] == "urllib3"
+
+    ignored, entry = ignorelist.should_ignore(
+        "GHSA-wqvq-5m8c-6g24", "requests", ["CVE-2020-26137"]
+    )
+    assert not ignored and entry == {}
+
+
+def test_should_ignore_skips_invalid_entries(capsys: Any) -> None:
+    ignorelist = SkjoldIgnore.using_document(
+        ".skjoldignore",
+        {
+            "version": "1.1",
+            "ignore": {
+                "CVE-0000-0000": [{"package": "example", "expires": "soon"}],
+                "CVE-0000-0001": [{"expires": "2099-01-01T00:00:00+0000"}],
+                "CVE-0000-0002": [
+                    {"package": "example", "expires": "2099-01-01T00:00:00+0000"}
+                ],
+            },
+        },
+    )
+    assert ignorelist.should_ignore("CVE-0000-0000", "example") == (False, {})
+    assert ignorelist.should_ignore("CVE-0000-0001", "example") == (False, {})
+    assert ignorelist.should_ignore("CVE-0000-0002", "example")[0]
+
+    stderr = capsys.readouterr().err
+    assert "Invalid entry for 'CVE-0000-0000'" in stderr
+    assert "Invalid entry for 'CVE-0000-0001'" in stderr
@@ -1,12 +1,23 @@
+import json
 import os
-from typing import Any
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
 import pytest
 import yaml
+from _pytest.monkeypatch import MonkeyPatch
 from packaging.utils import NormalizedName
 
+from conftest import FakeHTTPHandler, FakeHTTPServer
 from skjold.core import Dependency
-from skjold.sources.osv import OSV, OSVSecurityAdvisory, _osv_dev_api_request
+from skjold.sources.osv import (
+    OSV,
+    OSVSecurityAdvisory,
+    _osv_dev_api_querybatch,
+    _osv_dev_api_vulnerability,
+)
 
 
 def osv_advisory_yml(name: str) -> Any:
@@ -113,11 +124,11 @@ def test_ensure_is_affected(
 
 
 def test_osv_advisory_with_vulnerable_package_via_osv_api() -> None:
-    vulnerabilities = _osv_dev_api_request(NormalizedName("jinja2"), "2.11.2")
-    assert vulnerabilities[0]
+    (vuln_ids,) = _osv_dev_api_querybatch([(NormalizedName("jinja2"), "2.11.2")])
+    assert "PYSEC-2021-66" in vuln_ids
 
-    obj = OSVSecurityAdvisory.using(vulnerabilities[0])[0]
-    assert obj.identifier in ["PYSEC-2021-66", "GHSA-g3rq-g295-4j3m"]
+    obj = OSVSecurityAdvisory.using(_osv_dev_api_vulnerability("PYSEC-2021-66"))[0]
+    assert obj.identifier == "PYSEC-2021-66"
     assert obj.package_name == "jinja2"
     assert obj.summary.startswith(
         "This affects the package jinja2 from 0.0.0 and before 2.11.3."
@@ -150,3 +161,133 @@ def test_ensure_pypi_advisory_db_update(cache_dir: str) -> None:
 
     found, findings = source.is_vulnerable_package(Dependency("httpx", "0.19.0"))
     assert found is True and len(findings) > 0
+
+
+class FakeOSV:
+    """Local stand-in for the OSV.dev API serving the fixtures in `fixtures/osv`."""
+
+    vulns: Dict[Tuple[str, str], List[str]]
+    documents: Dict[str, Any]
+    batches: List[int]
+    fetched: List[str]
+    lock: threading.Lock
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+    def __init__(self) -> None:
+        self.documents = {
+            "PYSEC-2021-54": osv_advisory_yml("PYSEC-2021-54.yaml"),
+            "PYSEC-2021-59": osv_advisory_yml("PYSEC-2021-59.yaml"),
+            "PYSEC-0000-00": {
+                "id": "PYSEC-0000-00",
+                "details": "...",
+                "affected": [{"package": {"name": "urllib3"}, "versions": ["1.26.1"]}],
+            },
+        }
+        self.vulns = {
+            ("salt", "3002"): ["PYSEC-2021-54"],
+            ("urllib3", "1.26.1"): ["PYSEC-2021-59", "PYSEC-0000-00"],
+            ("urllib3", "1.26.2"): ["PYSEC-2021-59"],
+        }
+        self.batches, self.fetched = [], []
+        self.lock = threading.Lock()
+
+    def querybatch(self, request: FakeHTTPHandler) -> None:
+        assert request.path == "/v1/querybatch"
+        queries = json.loads(
+            request.rfile.read(int(request.headers["Content-Length"]))
+        )["queries"]
+        self.batches.append(len(queries))
+        results = []
+        for query in queries:
+            key = (query["package"]["name"], query["version"])
+            ids = self.vulns.get(key, [])
+            results.append({"vulns": [{"id": vuln_id} for vuln_id in ids]})
+        request.send_json({"results": results})
+
+    def vulnerability(self, request: FakeHTTPHandler) -> None:
+        vuln_id = request.path.rsplit("/", 1)[-1]
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.1)
+        with self.lock:
+            self.fetched.append(vuln_id)
+            self.in_flight -= 1
+        request.send_json(self.documents[vuln_id])
+
+
+@pytest.fixture
+def osv_server(http_server: FakeHTTPServer, monkeypatch: MonkeyPatch) -> FakeOSV:
+    osv = FakeOSV()
+    http_server.handlers.update({"POST": osv.querybatch, "GET": osv.vulnerability})
+    monkeypatch.setattr(OSV, "_api_url", http_server.url)
+    return osv
+
+
+def test_osv_match_many_uses_querybatch(
+    osv_server: FakeOSV, tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    monkeypatch.setattr(OSV, "_batch_size", 2)
+    source = OSV(str(tmp_path), 3600)
+    dependencies = [
+        Dependency("urllib3", "1.26.1", ("requirements.txt", 1)),
+        Dependency("salt", "3002", ("requirements.txt", 2)),
+        Dependency("requests", "2.25.0", ("requirements.txt", 3)),
+        Dependency("urllib3", "1.26.2", ("requirements-dev.txt", 1)),
+        Dependency("urllib3", "1.26.1", ("requirements-dev.txt", 2)),
+    ]
+
+    matches = source.match_many(dependencies)
+
+    # 4 unique dependencies in chunks of 2 and 3 unique vulnerabilities fetched concurrently.
+    assert osv_server.batches == [2, 2]
+    assert sorted(osv_server.fetched) == [
+        "PYSEC-0000-00",
+        "PYSEC-2021-54",
+        "PYSEC-2021-59",
+    ]
+    assert osv_server.max_in_flight > 1
+
+    assert [(d.name, d.source) for d, _ in matches] == [
+        ("urllib3", ("requirements.txt", 1)),
+        ("salt", ("requirements.txt", 2)),
+        ("urllib3", ("requirements-dev.txt", 1)),
+        ("urllib3", ("requirements-dev.txt", 2)),
+    ]
+    assert [a.identifier for a in matches[0][1]] == ["PYSEC-2021-59", "PYSEC-0000-00"]
+
+    # Subsequent lookups are answered without further requests.
+    assert not source.has_security_advisory_for(Dependency("requests", "2.25.0"))
+    found, findings = source.is_vulnerable_package(Dependency("salt", "3002"))
+    assert found and findings[0].identifier == "PYSEC-2021-54"
+    assert osv_server.batches == [2, 2]
+
+
+def test_osv_responses_are_cached_on_disk(osv_server: FakeOSV, tmp_path: Path) -> None:
+    dependencies = [
+        Dependency("urllib3", "1.26.2"),
+        Dependency("requests", "2.25.0"),
+    ]
+    source = OSV(str(tmp_path), 3600)
+    assert len(source.match_many(dependencies)) == 1
+    assert osv_server.batches == [2]
+    assert osv_server.fetched == ["PYSEC-2021-59"]
+
+    # Both the finding and the negative result are served from the cache.
+    source = OSV(str(tmp_path), 3600)
+    assert len(source.match_many(dependencies)) == 1
+    assert osv_server.batches == [2]
+    assert osv_server.fetched == ["PYSEC-2021-59"]
+
+    # Only unknown packages are requested.
+    source = OSV(str(tmp_path), 3600)
+    matches = source.match_many(dependencies + [Dependency("urllib3", "1.26.1")])
+    assert len(matches) == 2
+    assert osv_server.batches == [2, 1]
+    assert sorted(osv_server.fetched) == ["PYSEC-0000-00", "PYSEC-2021-59"]
+
+    # Expired entries are requested again.
+    source = OSV(str(tmp_path), 0)
+    assert len(source.match_many(dependencies)) == 1
+    assert osv_server.batches == [2, 1, 2]
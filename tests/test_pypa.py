@@ -1,3 +1,7 @@
+import os
+from pathlib import Path
+from typing import Callable, Mapping
+
 from skjold.core import Dependency
 from skjold.sources.pypa import PyPAAdvisoryDB
 
@@ -24,3 +28,25 @@ def test_ensure_pypi_advisory_db_update(cache_dir: str) -> None:
 
     found, findings = source.is_vulnerable_package(Dependency("httpx", "0.19.0"))
     assert found and len(findings) >= 0
+
+
+def test_ensure_pypa_populate_from_cache(
+    tmp_path: Path, make_tarball: Callable[[str, Mapping[str, bytes]], str]
+) -> None:
+    fixtures = os.path.join(os.path.dirname(__file__), "fixtures", "osv")
+    members = {"pypa-advisory-db-0000000/README.md": b"..."}
+    for package, name in [
+        ("salt", "PYSEC-2021-54.yaml"),
+        ("urllib3", "PYSEC-2021-59.yaml"),
+    ]:
+        with open(os.path.join(fixtures, name), "rb") as fh:
+            members[f"pypa-advisory-db-0000000/vulns/{package}/{name}"] = fh.read()
+
+    source = PyPAAdvisoryDB(str(tmp_path), 3600)
+    make_tarball(source.path, members)
+    source.populate_from_cache()
+
+    assert sorted(source._advisories.keys()) == ["salt", "urllib3"]
+    found, findings = source.is_vulnerable_package(Dependency("urllib3", "1.26.3"))
+    assert found and findings[0].identifier == "PYSEC-2021-59"
+    assert source.is_vulnerable_package(Dependency("urllib3", "1.26.5")) == (False, [])
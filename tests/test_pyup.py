@@ -1,5 +1,7 @@
 import datetime
 import json
+import os
+from pathlib import Path
 from typing import Any, Dict, List
 from unittest import mock
 
@@ -176,3 +178,18 @@ def test_ensure_accessing_advisories_triggers_update(
     assert len(source.get_security_advisories()) > 50
     assert spy.assert_called
     assert source.total_count > 50
+
+
+def test_pyup_loads_from_snapshot(tmp_path: Path, mocker: Any) -> None:
+    with open(os.path.join(tmp_path, "pyup.cache"), "w") as fh:
+        json.dump(pyup_advisories_with_metadata(), fh)
+
+    pyup = PyUp(cache_dir=str(tmp_path), cache_expires=3600)
+    assert pyup.has_security_advisory_for(Dependency("package", "1.0"))
+    assert os.path.exists(pyup.snapshot_path or "")
+
+    pyup = PyUp(cache_dir=str(tmp_path), cache_expires=3600)
+    spy = mocker.spy(pyup, "populate_from_cache")
+    assert pyup.has_security_advisory_for(Dependency("package", "1.0"))
+    assert pyup.last_updated_at == datetime.datetime(2020, 10, 1, 6, 0, 1)
+    assert spy.call_count == 0
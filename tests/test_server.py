@@ -0,0 +1,161 @@
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Generator
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+import skjold.sources
+from skjold.core import Dependency, SkjoldException
+from skjold.ignore import SkjoldIgnore
+from skjold.server import (
+    AuditServer,
+    audit_remote,
+    create_server,
+    parse_address,
+    server_status,
+)
+from skjold.sources.pyup import PyUp
+from skjold.tasks import Configuration, audit
+
+
+@pytest.fixture
+def configuration(tmp_path: Path, make_pyup_cache: Callable[..., str]) -> Configuration:
+    make_pyup_cache(str(tmp_path))
+    config = Configuration()
+    config.use({"sources": ["pyup"], "cache_dir": str(tmp_path)})
+    config.cache_expires = 3600
+    return config
+
+
+def _serve(server: AuditServer) -> Generator[AuditServer, None, None]:
+    server.preload()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(params=["tcp", "unix"])
+def address(
+    request: pytest.FixtureRequest, configuration: Configuration, tmp_path: Path
+) -> Generator[str, None, None]:
+    if request.param == "tcp":
+        server = create_server(configuration, "127.0.0.1:0")
+        port = server.server_address[1]  # type: ignore[index]
+        address_ = f"127.0.0.1:{port}"
+    else:
+        address_ = f"unix:{tmp_path / 'skjold.sock'}"
+        server = create_server(configuration, address_)
+
+    for _ in _serve(server):
+        yield address_
+
+
+def test_parse_address() -> None:
+    assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+    assert parse_address("unix:/tmp/skjold.sock") == "/tmp/skjold.sock"
+    with pytest.raises(SkjoldException):
+        parse_address("localhost")
+
+
+def test_create_server_refuses_to_replace_other_files(
+    configuration: Configuration, tmp_path: Path
+) -> None:
+    path = tmp_path / "skjold.sock"
+    path.write_text("keep")
+
+    with pytest.raises(SkjoldException):
+        create_server(configuration, f"unix:{path}")
+    assert path.read_text() == "keep"
+
+
+def test_create_server_replaces_stale_sockets(
+    configuration: Configuration, tmp_path: Path
+) -> None:
+    address_ = f"unix:{tmp_path / 'skjold.sock'}"
+    create_server(configuration, address_).server_close()
+
+    server = create_server(configuration, address_)
+    server.server_close()
+
+
+def test_audit_remote_matches_local_audit(
+    address: str, configuration: Configuration
+) -> None:
+    dependencies = [
+        Dependency("urllib3", "1.23", ("requirements.txt", 1)),
+        Dependency("requests", "2.25.0", ("requirements.txt", 2)),
+    ]
+    ignore = SkjoldIgnore("<none>")
+
+    findings = audit_remote(address, dependencies, ignore)
+    assert findings == audit(configuration, dependencies, ignore)
+    assert [finding["identifier"] for finding in findings] == ["CVE-2019-11324"]
+    assert findings[0]["__file__"] == {"path": "requirements.txt", "lineno": 1}
+    assert server_status(address)["sources"] == ["pyup"]
+
+
+def test_audit_remote_applies_ignore_entries(address: str) -> None:
+    ignore = SkjoldIgnore("<none>")
+    ignore.add("CVE-2019-11324", "urllib3", reason="Not exploitable.")
+
+    (finding,) = audit_remote(address, [Dependency("urllib3", "1.23")], ignore)
+    assert finding["ignored"]["ignored"] is True
+    assert finding["ignored"]["reason"] == "Not exploitable."
+
+
+def test_audit_remote_sends_whether_to_merge_findings(
+    address: str, mocker: Any
+) -> None:
+    spy = mocker.patch("skjold.server.audit", wraps=audit)
+
+    for deduplicate in [False, True]:
+        audit_remote(
+            address,
+            [Dependency("urllib3", "1.23")],
+            SkjoldIgnore("<none>"),
+            None,
+            deduplicate,
+        )
+        assert spy.call_args[0][0].deduplicate is deduplicate
+
+
+def test_audit_remote_reports_server_errors(address: str) -> None:
+    with pytest.raises(SkjoldException) as excinfo:
+        audit_remote(address, [], SkjoldIgnore("<none>"), sources=["unknown"])
+    assert "'unknown' does not exist" in str(excinfo.value)
+
+
+def test_server_refreshes_outdated_sources_in_background(
+    configuration: Configuration, tmp_path: Path, monkeypatch: MonkeyPatch
+) -> None:
+    refreshed = threading.Event()
+
+    def update(source: PyUp) -> None:
+        os.utime(source.path)
+        refreshed.set()
+
+    monkeypatch.setattr(PyUp, "update", update)
+    server = create_server(configuration, "127.0.0.1:0")
+    address = f"127.0.0.1:{server.server_address[1]}"  # type: ignore[index]
+
+    for _ in _serve(server):
+        (status,) = server_status(address)["loaded"]
+        assert status["name"] == "pyup" and status["refresh_duration"] is None
+
+        os.utime(os.path.join(tmp_path, "pyup.cache"), (0, 0))
+        server.start_refresh(0.01)
+        assert refreshed.wait(5)
+        server.stop_refresh()
+
+        (status,) = server_status(address)["loaded"]
+        assert status["refresh_duration"] is not None
+        assert status["refresh_error"] is None
+        assert audit_remote(
+            address, [Dependency("urllib3", "1.23")], SkjoldIgnore("<none>")
+        )
@@ -1,16 +1,34 @@
+import json
 import os
-from typing import Any, List, Tuple
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 
+import click
 import pytest
 from packaging.utils import NormalizedName
 
+import skjold.sources
 from skjold.core import (
     Dependency,
+    DependencyList,
     SecurityAdvisory,
     SecurityAdvisorySource,
     SkjoldException,
+    parse_version,
+)
+from skjold.ignore import SkjoldIgnore
+from skjold.tasks import (
+    Configuration,
+    SourceRegistry,
+    audit,
+    get_registered_sources,
+    get_source,
+    is_registered_source,
+    iter_audit,
+    load_sources,
+    register_source,
+    report,
 )
-from skjold.tasks import Configuration, is_registered_source, register_source
 
 
 class DummyAdvisory(SecurityAdvisory):
@@ -112,3 +130,344 @@ def test_register_source_twice() -> None:
         register_source("dummy", DummyAdvisorySource)
         assert is_registered_source("dummy")
         register_source("dummy", DummyAdvisorySource)
+
+
+def test_builtin_sources_are_imported_on_first_use() -> None:
+    from skjold.sources.pypa import PyPAAdvisoryDB
+
+    assert {"github", "pyup", "static"} <= set(get_registered_sources())
+    assert get_source("pypa") is PyPAAdvisoryDB
+    assert skjold.sources.PyPAAdvisoryDB is PyPAAdvisoryDB
+
+    with pytest.raises(SkjoldException):
+        register_source("osv", DummyAdvisorySource)
+    with pytest.raises(SkjoldException):
+        get_source("unknown")
+
+
+def test_parse_version_reuses_parsed_versions() -> None:
+    assert parse_version("1.2.3") is parse_version("1.2.3")
+    assert parse_version("1.2.3") == parse_version("1.2.3.0")
+
+
+class CountingAdvisorySource(DummyAdvisorySource):
+    calls: List[Dependency]
+
+    def is_vulnerable_package(
+        self, dependency: Dependency
+    ) -> Tuple[bool, List[SecurityAdvisory]]:
+        self.calls.append(dependency)
+        if dependency.version == "1.2.3":
+            return True, [DummyAdvisory()]
+        return False, []
+
+
+def test_match_many_evaluates_unique_dependencies_once(cache_dir: str) -> None:
+    source = CountingAdvisorySource(cache_dir)
+    source.calls = []
+    dependencies = [
+        Dependency("Vulnerable", "1.2.3", ("requirements.txt", 1)),
+        Dependency("other", "1.2.3", ("requirements.txt", 2)),
+        Dependency("vulnerable", "1.2.3", ("requirements-dev.txt", 7)),
+        Dependency("vulnerable", "2.0.0", ("poetry.lock", None)),
+    ]
+
+    matches = source.match_many(dependencies)
+
+    assert [dependency for dependency, _ in matches] == [
+        dependencies[0],
+        dependencies[2],
+    ]
+    assert matches[0][1] is matches[1][1]
+    assert [(d.canonical_name, d.version) for d in source.calls] == [
+        ("vulnerable", "1.2.3"),
+        ("vulnerable", "2.0.0"),
+    ]
+
+
+class FailingAdvisorySource(DummyAdvisorySource):
+    def update(self) -> None:
+        raise SkjoldException("Unable to download database.")
+
+
+def test_load_sources_reports_errors_per_source(cache_dir: str) -> None:
+    register_source("failing", FailingAdvisorySource)
+    register_source("counting", CountingAdvisorySource)
+
+    config = Configuration()
+    config.use({"sources": ["counting", "failing"], "cache_dir": cache_dir})
+    config.jobs = 2
+
+    with pytest.raises(click.ClickException) as excinfo:
+        load_sources(config, set())
+    assert "failing: Unable to download database." in excinfo.value.message
+    assert "counting" not in excinfo.value.message
+
+    config.sources = ["counting", "dummy2"]
+    sources = load_sources(config, set())
+    assert [type(source) for source in sources] == [
+        CountingAdvisorySource,
+        DummyAdvisorySource,
+    ]
+
+
+def test_sources_do_not_share_advisories(cache_dir: str) -> None:
+    loaded = DummyAdvisorySource(cache_dir)
+    assert len(loaded.advisories) == 1
+
+    assert len(DummyAdvisorySource(cache_dir)._advisories) == 0
+
+
+class StaticAdvisorySource(DummyAdvisorySource):
+    loads: int = 0
+
+    @property
+    def snapshot_path(self) -> Optional[str]:
+        return None
+
+    def update(self) -> None:
+        with open(self.path, "w"):
+            pass
+
+    def populate_from_cache(self) -> None:
+        StaticAdvisorySource.loads += 1
+        self._advisories = {NormalizedName("single"): [DummyAdvisory()]}
+
+
+register_source("static", StaticAdvisorySource)
+
+
+def test_registry_reuses_loaded_sources(tmp_path: Path) -> None:
+    config = Configuration()
+    config.use({"sources": ["static"], "cache_dir": str(tmp_path)})
+    config.cache_expires = 3600
+    registry = SourceRegistry()
+    StaticAdvisorySource.loads = 0
+
+    first = load_sources(config, set(), registry)
+    assert load_sources(config, set(), registry) == first
+    assert StaticAdvisorySource.loads == 1
+    assert len(registry) == 1
+
+    # Sources for a different configuration are kept separately.
+    other = Configuration()
+    other.use({"sources": ["static"], "cache_dir": str(tmp_path)})
+    other.cache_expires = 7200
+    assert load_sources(other, set(), registry) != first
+    assert len(registry) == 2
+
+    registry.max_age = 0
+    assert load_sources(config, set(), registry) != first
+    assert StaticAdvisorySource.loads == 3
+
+
+def test_registry_evicts_least_recently_used_sources(tmp_path: Path) -> None:
+    config = Configuration()
+    config.use({"sources": ["static"], "cache_dir": str(tmp_path)})
+    registry = SourceRegistry(max_advisories=1)
+
+    for cache_expires in [3600, 7200]:
+        config.cache_expires = cache_expires
+        (source,) = load_sources(config, set(), registry)
+        assert source.loaded_count == 1
+
+    assert len(registry) == 1
+    assert load_sources(config, set(), registry) == [source]
+
+
+class FlakyAdvisorySource(StaticAdvisorySource):
+    fail: bool = False
+
+    def update(self) -> None:
+        if FlakyAdvisorySource.fail:
+            raise SkjoldException("Unable to download database.")
+        super().update()
+
+
+register_source("flaky", FlakyAdvisorySource)
+
+
+def test_registry_refreshes_outdated_sources_in_background(tmp_path: Path) -> None:
+    config = Configuration()
+    config.use({"sources": ["flaky"], "cache_dir": str(tmp_path)})
+    config.cache_expires = 3600
+    registry = SourceRegistry()
+    registry.background_refresh = True
+
+    (first,) = load_sources(config, set(), registry)
+    assert registry.refresh() == 0
+
+    # Outdated sources keep being served until their replacement is loaded.
+    os.utime(first.path or "", (0, 0))
+    FlakyAdvisorySource.fail = True
+    assert load_sources(config, set(), registry) == [first]
+    assert registry.refresh() == 0
+    (status,) = registry.status()
+    assert status["refresh_error"] == "Unable to download database."
+    assert load_sources(config, set(), registry) == [first]
+
+    FlakyAdvisorySource.fail = False
+    assert registry.refresh() == 1
+    (second,) = load_sources(config, set(), registry)
+    assert second is not first and len(second.advisories) == 1
+    (status,) = registry.status()
+    assert status["name"] == "flaky"
+    assert status["refresh_error"] is None
+    assert status["refresh_duration"] >= 0
+
+
+class VulnerableAdvisorySource(StaticAdvisorySource):
+    _name: str = "vulnerable"
+
+    def is_vulnerable_package(
+        self, dependency: Dependency
+    ) -> Tuple[bool, List[SecurityAdvisory]]:
+        return dependency.version == "1.2.3", [DummyAdvisory()]
+
+
+register_source("vulnerable", VulnerableAdvisorySource)
+
+
+class LaterAdvisorySource(VulnerableAdvisorySource):
+    _name: str = "later"
+    matched: int = 0
+
+    def match_many(
+        self, dependencies: DependencyList
+    ) -> List[Tuple[Dependency, Sequence[SecurityAdvisory]]]:
+        LaterAdvisorySource.matched += 1
+        return super().match_many(dependencies)
+
+
+register_source("later", LaterAdvisorySource)
+
+
+def test_report_streams_ndjson_findings(tmp_path: Path, capsys: Any) -> None:
+    config = Configuration()
+    config.use({"sources": ["vulnerable", "later"], "cache_dir": str(tmp_path)})
+    config.report_format = "ndjson"
+    dependencies = [
+        Dependency("vulnerable", "1.2.3", ("a/requirements.txt", 1)),
+        Dependency("vulnerable", "2.0.0", ("b/requirements.txt", 1)),
+        Dependency("vulnerable", "1.2.3", ("c/requirements.txt", 3)),
+    ]
+    ignore = SkjoldIgnore("<none>")
+
+    findings = iter_audit(config, dependencies, ignore)
+    assert isinstance(findings, Iterator)
+    expected = audit(config, dependencies, ignore)
+    assert [
+        (finding["sources"], finding["__file__"]["path"]) for finding in expected
+    ] == [
+        (["vulnerable"], "a/requirements.txt"),
+        (["vulnerable"], "c/requirements.txt"),
+        (["later"], "a/requirements.txt"),
+        (["later"], "c/requirements.txt"),
+    ]
+
+    lines: List[str] = []
+    written_before: List[int] = []
+    matched_before: List[int] = []
+    LaterAdvisorySource.matched = 0
+
+    def _findings() -> Iterator[Dict[str, Any]]:
+        for finding in findings:
+            lines.extend(capsys.readouterr().out.splitlines())
+            written_before.append(len(lines))
+            matched_before.append(LaterAdvisorySource.matched)
+            yield finding
+
+    vulnerable_packages, ignored = report(config, _findings())
+    lines.extend(capsys.readouterr().out.splitlines())
+
+    # Every finding has been written before the next one is requested and the findings of
+    # the first source before the second one is matched.
+    assert written_before == [0, 1, 2, 3]
+    assert matched_before == [0, 0, 1, 1]
+    assert [json.loads(line) for line in lines] == expected
+    assert vulnerable_packages == {"vulnerable"} and ignored == []
+
+
+class AliasedAdvisory(DummyAdvisory):
+    @property
+    def identifier(self) -> str:
+        return "PYSEC-0000-1"
+
+    @property
+    def aliases(self) -> List[str]:
+        return ["CVE-0000-0001", "D-UMMY"]
+
+
+class AliasedAdvisorySource(StaticAdvisorySource):
+    _name: str = "aliased"
+
+    def is_vulnerable_package(
+        self, dependency: Dependency
+    ) -> Tuple[bool, List[SecurityAdvisory]]:
+        return True, [AliasedAdvisory()]
+
+
+register_source("aliased", AliasedAdvisorySource)
+
+
+def test_ignore_entries_apply_to_aliases_from_other_sources(tmp_path: Path) -> None:
+    config = Configuration()
+    config.use({"sources": ["vulnerable", "aliased"], "cache_dir": str(tmp_path)})
+    config.deduplicate = False
+    ignore = SkjoldIgnore("<none>")
+    ignore.add("D-UMMY", "dummy", reason="Not exploitable.")
+
+    findings = audit(config, [Dependency("vulnerable", "1.2.3")], ignore)
+    assert [item["identifier"] for item in findings] == ["D-UMMY", "PYSEC-0000-1"]
+    assert all(item["ignored"]["ignored"] for item in findings)
+    assert {item["ignored"]["reason"] for item in findings} == {"Not exploitable."}
+
+
+def test_findings_of_the_same_issue_are_merged_per_dependency(tmp_path: Path) -> None:
+    config = Configuration()
+    config.use({"sources": ["vulnerable", "aliased"], "cache_dir": str(tmp_path)})
+    dependencies = [
+        Dependency("vulnerable", "1.2.3", ("requirements.txt", 1)),
+        Dependency("vulnerable", "1.2.3", ("requirements-dev.txt", 1)),
+    ]
+
+    findings = audit(config, dependencies, SkjoldIgnore("<none>"))
+    assert [item["__file__"]["path"] for item in findings] == [
+        "requirements.txt",
+        "requirements-dev.txt",
+    ]
+    for finding in findings:
+        assert finding["identifier"] == "D-UMMY"
+        assert finding["identifiers"] == ["D-UMMY", "PYSEC-0000-1"]
+        assert finding["sources"][1:] == ["aliased"]
+        assert finding["severity"] == "HIGH"
+        assert not finding["ignored"]["ignored"]
+
+    config.deduplicate = False
+    assert len(audit(config, dependencies, SkjoldIgnore("<none>"))) == 4
+
+
+def test_advisories_without_identifier_are_not_merged(
+    tmp_path: Path, make_pyup_cache: Callable[..., str]
+) -> None:
+    make_pyup_cache(
+        str(tmp_path),
+        {
+            "foo": [
+                {"advisory": "First.", "cve": None, "id": "pyup.io-1", "specs": ["<2"]},
+                {
+                    "advisory": "Second.",
+                    "cve": None,
+                    "id": "pyup.io-2",
+                    "specs": ["<2"],
+                },
+            ]
+        },
+    )
+    config = Configuration()
+    config.use({"sources": ["pyup"], "cache_dir": str(tmp_path)})
+    config.cache_expires = 3600
+
+    findings = audit(config, [Dependency("foo", "1.0")], SkjoldIgnore("<none>"))
+    assert [item["identifiers"] for item in findings] == [["pyup.io-1"], ["pyup.io-2"]]
+    assert [item["summary"] for item in findings] == ["First.", "Second."]
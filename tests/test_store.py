@@ -0,0 +1,88 @@
+import datetime
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Callable
+
+from packaging.utils import NormalizedName
+
+from skjold.core import Dependency
+from skjold.sources.pyup import PyUp, PyUpSecurityAdvisory
+from skjold.store import AdvisoryStore
+
+
+def _advisory(name: str, cve: str) -> PyUpSecurityAdvisory:
+    return PyUpSecurityAdvisory.using(
+        name, {"advisory": "...", "cve": cve, "specs": ["<1.0"]}
+    )
+
+
+def test_store_replaces_and_queries_advisories_by_package(tmp_path: Path) -> None:
+    store = AdvisoryStore(os.path.join(tmp_path, "advisories.sqlite"))
+    assert not store.is_current("pyup", (1, "abc"))
+
+    store.replace(
+        "pyup",
+        (1, "abc"),
+        {
+            NormalizedName("a"): [_advisory("a", "CVE-1"), _advisory("a", "CVE-2")],
+            NormalizedName("b"): [_advisory("b", "CVE-3")],
+        },
+        {"timestamp": 1},
+    )
+    store.replace("other", (2, "def"), {NormalizedName("c"): [_advisory("c", "X")]})
+
+    assert store.is_current("pyup", (1, "abc"))
+    assert not store.is_current("pyup", (1, "abd"))
+    assert store.state("pyup") == {"timestamp": 1}
+
+    advisories = store.advisories("pyup", PyUpSecurityAdvisory.from_json)
+    assert len(advisories) == 2
+    assert sorted(advisories) == ["a", "b"]
+    assert "a" in advisories.keys() and "c" not in advisories.keys()
+    assert [advisory.identifier for advisory in advisories["a"]] == ["CVE-1", "CVE-2"]
+    assert advisories["a"] is advisories["a"]
+    assert advisories.get(NormalizedName("c")) is None
+
+    store.replace("pyup", (3, "ghi"), {NormalizedName("b"): [_advisory("b", "CVE-4")]})
+    assert sorted(store.advisories("pyup", PyUpSecurityAdvisory.from_json)) == ["b"]
+    assert store.count("other") == 1
+    store.close()
+
+
+def test_pyup_uses_store_instead_of_snapshot(
+    tmp_path: Path, mocker: Any, make_pyup_cache: Callable[..., str]
+) -> None:
+    make_pyup_cache(str(tmp_path))
+    store = AdvisoryStore(os.path.join(tmp_path, "advisories.sqlite"))
+
+    pyup = PyUp(cache_dir=str(tmp_path), cache_expires=3600, store=store)
+    assert pyup.has_security_advisory_for(Dependency("urllib3", "1.23"))
+    assert not os.path.exists(pyup.snapshot_path or "")
+
+    pyup = PyUp(cache_dir=str(tmp_path), cache_expires=3600, store=store)
+    spy = mocker.spy(pyup, "populate_from_cache")
+    assert pyup.is_vulnerable_package(Dependency("URLLib3", "1.23"))[0]
+    assert not pyup.has_security_advisory_for(Dependency("other", "0.9"))
+    assert pyup.total_count == 1
+    assert pyup.last_updated_at == datetime.datetime(2020, 10, 1, 6, 0, 1)
+    assert spy.call_count == 0
+
+
+def test_store_rebuilds_databases_of_other_versions(tmp_path: Path) -> None:
+    path = os.path.join(tmp_path, "advisories.sqlite")
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            "CREATE TABLE sources (name TEXT, version INTEGER, size INTEGER, sha256 TEXT, "
+            "state BLOB); INSERT INTO sources VALUES ('pyup', 5, 1, 'abc', NULL);"
+        )
+    connection.close()
+
+    store = AdvisoryStore(path)
+    assert not store.is_current("pyup", (1, "abc"))
+
+    store.replace("pyup", (1, "abc"), {NormalizedName("a"): [_advisory("a", "CVE-1")]})
+    (payload,) = store._query("SELECT payload FROM advisories")[0]
+    assert json.loads(payload)["cve"] == "CVE-1"
+    store.close()
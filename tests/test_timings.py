@@ -0,0 +1,87 @@
+import io
+import json
+import pstats
+from pathlib import Path
+from typing import Any, Callable
+
+from skjold import timings
+from skjold.core import Dependency
+from skjold.ignore import SkjoldIgnore
+from skjold.tasks import Configuration, audit
+
+
+def test_phases_and_counters_are_only_recorded_while_recording(
+    tmp_path: Path, capsys: Any
+) -> None:
+    with timings.phase("ignored"):
+        timings.count("ignored")
+
+    path = str(tmp_path / "timings.json")
+    with timings.recording(show=True, path=path) as recorder:
+        for _ in range(2):
+            with timings.phase("work"):
+                sum(range(10000))
+        timings.count("items", 3)
+        timings.count("items")
+
+    timings.count("items")
+    assert list(recorder.phases) == ["total", "work"]
+    assert recorder.phases["work"].calls == 2
+    assert 0 < recorder.phases["work"].wall <= recorder.phases["total"].wall
+    assert recorder.counters == {"items": 4}
+
+    with open(path) as fh:
+        assert json.load(fh) == recorder.as_dict()
+
+    table = capsys.readouterr().err
+    assert table.startswith("phase")
+    assert "work" in table and "items" in table
+
+
+def test_peak_memory_is_recorded_per_phase() -> None:
+    with timings.recording(show=False) as recorder:
+        with timings.phase("large"):
+            data = bytearray(8 * 2**20)
+            del data
+        with timings.phase("small"):
+            data = bytearray(2**20)
+            del data
+            with timings.phase("nested"):
+                pass
+
+    peaks = {name: item.peak_memory or 0 for name, item in recorder.phases.items()}
+    assert peaks["large"] >= 8 * 2**20 > peaks["small"] >= 2**20
+    assert peaks["total"] >= peaks["large"]
+    # The peak of a nested phase is not taken from the enclosing one.
+    assert peaks["nested"] < 2**20
+
+
+def test_recording_audit_reports_phases_per_source(
+    tmp_path: Path, make_pyup_cache: Callable[..., str]
+) -> None:
+    make_pyup_cache(str(tmp_path))
+    config = Configuration()
+    config.use({"sources": ["pyup"], "cache_dir": str(tmp_path)})
+    config.cache_expires = 3600
+    dependencies = [Dependency("urllib3", "1.23"), Dependency("urllib3", "1.23")]
+
+    with timings.recording(show=False) as recorder:
+        assert len(audit(config, dependencies, SkjoldIgnore("<none>"))) == 2
+
+    assert {"total", "sources", "pyup/load", "pyup/match"} <= set(recorder.phases)
+    assert recorder.counters == {
+        "dependencies checked": 2,
+        "pyup/advisories loaded": 1,
+        "pyup/dependencies evaluated": 1,
+        "specifier evaluations": 1,
+    }
+
+
+def test_profiled_writes_cprofile_statistics(tmp_path: Path) -> None:
+    path = str(tmp_path / "skjold.prof")
+    with timings.profiled(path):
+        sorted(range(1000), reverse=True)
+
+    output = io.StringIO()
+    pstats.Stats(path, stream=output).print_stats()
+    assert "sorted" in output.getvalue()
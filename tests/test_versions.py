@@ -0,0 +1,87 @@
+from typing import List, Optional, Sequence
+
+import pytest
+from packaging.specifiers import SpecifierSet
+
+from skjold.versions import VersionIndex, compile_specifier_set, parse_version
+
+RANGES = [
+    ["<1.11.27", ">=2.2,<2.2.9", "==3.0"],
+    [">=4.0,<4.3.12"],
+    ["==1.26.0", "==1.26.1", "==1.26.2", "==1.26.3"],
+    [">=0.0.0"],
+    ["<=2.0", ">2.0.1,!=2.1"],
+    ["==2.2.*", "~=3.1"],
+    ["<1.0,>2.0"],
+    [],
+]
+VERSIONS = [
+    "0.1.6",
+    "1.0",
+    "1.0+local",
+    "1.11.26",
+    "1.11.27",
+    "1.26.0",
+    "1.26.3+ubuntu1",
+    "1.26.4",
+    "2.0",
+    "2.0.1",
+    "2.0.post1",
+    "2.1",
+    "2.2rc1",
+    "2.2",
+    "2.2.8",
+    "2.2.9",
+    "3.0",
+    "3.0.0.dev1",
+    "3.1.5",
+    "4.0",
+    "4.3.12",
+    "1!0.1",
+]
+
+
+@pytest.mark.parametrize(
+    "specifier, expected",
+    [
+        (">=1.0,<2.0", ("1.0", "2.0")),
+        ("==1.2.3", ("1.2.3", "1.2.3")),
+        ("<2.0", (None, "2.0")),
+        ("!=1.0", (None, None)),
+        ("==1.*", (None, None)),
+        (">2.0,<1.0", None),
+    ],
+)
+def test_compile_specifier_set(
+    specifier: str, expected: Optional[Sequence[Optional[str]]]
+) -> None:
+    interval = compile_specifier_set(SpecifierSet(specifier, prereleases=True))
+    if expected is None:
+        assert interval is None
+    else:
+        assert interval == tuple(
+            None if bound is None else parse_version(bound) for bound in expected
+        )
+
+
+@pytest.mark.parametrize("version", VERSIONS)
+def test_version_index_candidates_contain_all_matches(version: str) -> None:
+    items = [
+        [SpecifierSet(spec, prereleases=True) for spec in specs] for specs in RANGES
+    ]
+    index = VersionIndex(items, lambda item: item)
+
+    candidates = index.candidates(parse_version(version))
+    expected = [item for item in items if any(version in spec for spec in item)]
+    assert [item for item in candidates if any(version in s for s in item)] == expected
+
+
+def test_version_index_prunes_candidates() -> None:
+    items: List[Optional[List[SpecifierSet]]] = [
+        [SpecifierSet(f"=={minor}.0", prereleases=True)] for minor in range(500)
+    ]
+    items.append(None)
+    index = VersionIndex(items, lambda item: item)
+
+    candidates = index.candidates(parse_version("42.0"))
+    assert candidates == (items[42], None)